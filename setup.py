@@ -1,4 +1,12 @@
-from setuptools import setup, find_packages
+import os
+from setuptools import setup
+
+# Opt-in ahead-of-time compilation of the hot wrappers: MONGOPH_USE_MYPYC=1 pip install .
+# The pure Python modules are used otherwise.
+ext_modules = []
+if os.getenv('MONGOPH_USE_MYPYC') == '1':
+    from mypyc.build import mypycify
+    ext_modules = mypycify(['src/pymongo_helper.py', 'src/utils.py'])
 
 setup(
     name='pymongo-helper',
@@ -17,11 +25,17 @@ setup(
         'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
         'Operating System :: OS Independent',
     ],
-    package_dir={'': 'src'},
-    packages=find_packages(where='src'),
+    # The package is imported as `src`, the name the compiled modules are built under.
+    packages=['src'],
+    ext_modules=ext_modules,
     python_requires='>=3.6',
     install_requires=[
         'pymongo==4.7.0',
         'pytest==8.2.0',
     ],
+    extras_require={
+        'json': ['orjson'],
+        'motor': ['motor>=3.4'],
+        'compression': ['pymongo[snappy,zstd]'],
+    },
 )
@@ -1,6 +1,161 @@
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, OperationFailure,AutoReconnect
+import atexit
+import importlib.util
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ASCENDING, DESCENDING, HASHED, TEXT, IndexModel, MongoClient, ReturnDocument
+from pymongo.errors import ConnectionFailure, OperationFailure,AutoReconnect,CollectionInvalid
+from .utils import TTLCache, ttl_cache
+
+logger = logging.getLogger(__name__)
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+_collections: dict = {}
+
+INDEX_TYPES = {
+    'ascending': ASCENDING,
+    'descending': DESCENDING,
+    'text': TEXT,
+    'hashed': HASHED,
+}
+
+# Maximum number of `$inc` sent at once by `bulk_next_record_identifier_values`.
+_BULK_MAX_WORKERS = 8
+
+# Shared by every incrementor update, PyMongo only reads them: never mutate these dicts.
+_INCREMENTOR_PROJECTION = {'tally': True}
+_INCREMENTOR_UPDATE = {'$inc': {'tally': 1}}
+
+_REFERENCE_KEY = os.getenv('MONGOPH_REFERENCE_KEY', 'record_id')
+_INCREMENTOR_COLLECTION = os.getenv('MONGOPH_INCREMENTOR_COLLECTION', 'incrementors')
+_ID_BLOCK_SIZE = int(os.getenv('MONGOPH_ID_BLOCK_SIZE', '1'))
+_ENSURE_SORT_INDEX = os.getenv('MONGOPH_ENSURE_SORT_INDEX', '0') == '1'
+
+# Result of `ensure_sort_index` per (database, collection): True once the `created_at` index exists,
+# False when it conflicts with an existing index.
+_sort_indexes: dict = {}
+
+# Results of the read helpers, keyed on (database, collection, digest of the query). A TTL of 0
+# disables it, see `pymongo_helper._cached_read`.
+_read_cache = TTLCache(maxsize=1024, ttl=float(os.getenv('MONGOPH_READ_CACHE_TTL', '0')))
+
+def refresh_env():
+    """
+    The function `refresh_env` re-reads the `MONGOPH_REFERENCE_KEY`, `MONGOPH_INCREMENTOR_COLLECTION`,
+    `MONGOPH_ID_BLOCK_SIZE`, `MONGOPH_ENSURE_SORT_INDEX` and `MONGOPH_READ_CACHE_TTL` environment
+    variables. They are resolved once at import, so call it after changing them at runtime.
+    """
+    global _REFERENCE_KEY, _INCREMENTOR_COLLECTION, _ID_BLOCK_SIZE, _ENSURE_SORT_INDEX
+    _REFERENCE_KEY = os.getenv('MONGOPH_REFERENCE_KEY', 'record_id')
+    _INCREMENTOR_COLLECTION = os.getenv('MONGOPH_INCREMENTOR_COLLECTION', 'incrementors')
+    _ID_BLOCK_SIZE = int(os.getenv('MONGOPH_ID_BLOCK_SIZE', '1'))
+    _ENSURE_SORT_INDEX = os.getenv('MONGOPH_ENSURE_SORT_INDEX', '0') == '1'
+    _read_cache.ttl = float(os.getenv('MONGOPH_READ_CACHE_TTL', '0'))
+    _read_cache.clear()
+
+# Wire compressors in order of preference, with the module each one needs.
+_COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+def _compressors():
+    """
+    The function `_compressors` returns the wire protocol compressors offered to the server, from the
+    `MONGOPH_COMPRESSORS` environment variable or, when it is unset, every compressor whose module is
+    installed. The server picks the first one of the list it supports.
+    
+    :return: The comma separated compressor names, empty to disable compression.
+    """
+    compressors = os.getenv('MONGOPH_COMPRESSORS')
+    if compressors is not None:
+        return compressors
+    return ','.join(name for name, module in _COMPRESSOR_MODULES.items() if importlib.util.find_spec(module) is not None)
+
+def _client_options():
+    """
+    The function `_client_options` builds the connection pool, timeout and compression options of the
+    shared `MongoClient` from the `MONGOPH_*` environment variables.
+    
+    :return: A dict of `MongoClient` keyword arguments.
+    """
+    options = {
+        'maxPoolSize': int(os.getenv('MONGOPH_MAX_POOL', '50')),
+        'minPoolSize': int(os.getenv('MONGOPH_MIN_POOL', '5')),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGOPH_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        'connectTimeoutMS': int(os.getenv('MONGOPH_CONNECT_TIMEOUT_MS', '5000')),
+        'waitQueueTimeoutMS': int(os.getenv('MONGOPH_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        'retryWrites': True,
+    }
+    socket_timeout = os.getenv('MONGOPH_SOCKET_TIMEOUT_MS')
+    if socket_timeout:
+        options['socketTimeoutMS'] = int(socket_timeout)
+    compressors = _compressors()
+    if compressors:
+        options['compressors'] = compressors
+    return options
+
+def _get_client(connection_string:str):
+    """
+    The function `_get_client` returns the process-wide `MongoClient` for a connection string, creating
+    it on first use. `MongoClient` is thread-safe and pools its sockets, so every helper shares the same
+    instance instead of paying a full handshake per call.
+    
+    :param connection_string: The MongoDB connection string the client is created (and cached) for
+    :type connection_string: str
+    :return: The shared `MongoClient` for `connection_string`.
+    """
+    client = _clients.get(connection_string)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(connection_string)
+            if client is None:
+                client = MongoClient(connection_string, **_client_options())
+                _clients[connection_string] = client
+    return client
+
+@atexit.register
+def _close_clients():
+    """
+    The function `_close_clients` closes every cached `MongoClient`. It is registered with `atexit` so
+    pooled connections are released when the interpreter shuts down.
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _collections.clear()
+    for client in clients:
+        client.close()
+
+def _reset_after_fork():
+    """
+    The function `_reset_after_fork` runs in the child process after `os.fork()`. PyMongo clients are
+    not fork-safe, so the child drops the clients, collections and caches inherited from its parent and
+    lazily creates its own. The reserved ID blocks are dropped too, otherwise parent and child would
+    hand out the same IDs. Locks possibly held by parent threads at fork time are replaced, never
+    acquired.
+    """
+    global _clients_lock, _id_pool
+    _clients_lock = threading.Lock()
+    _clients.clear()
+    _collections.clear()
+    _id_pool = _IdPool()
+    _index_names.cache.reset()
+    _read_cache.reset()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _connection_string():
+    """
+    The function `_connection_string` reads the MongoDB connection string from the
+    `MONGOPH_MONGODB_CONNECTION_STRING` environment variable.
+    
+    :return: The connection string, a ValueError is raised when the variable is not set.
+    """
+    connection_string = os.getenv('MONGOPH_MONGODB_CONNECTION_STRING')
+    if not connection_string:
+        raise ValueError('MongoDB connection string not found in environment variable. set it with : MONGOPH_MONGODB_CONNECTION_STRING ')
+    return connection_string
 
 def connect_to_mongodb(database_name:str):
     """
@@ -15,22 +170,46 @@ def connect_to_mongodb(database_name:str):
     the specified database name, and `client` which is the MongoDB client object used to interact with
     the database.
     """
-    connection_string = os.getenv('MONGOPH_MONGODB_CONNECTION_STRING')
-    if not connection_string:
-        raise ValueError('MongoDB connection string not found in environment variable. set it with : MONGOPH_MONGODB_CONNECTION_STRING ')
-
+    connection_string = _connection_string()
     try:
-        client = MongoClient(connection_string)
+        client = _get_client(connection_string)
         db = client[database_name]
-        client.server_info()
         return db,client
     except Exception as e:
-        raise ValueError(f'Failed to connect to MongoDB: {e}')
+        raise ValueError(f'Failed to connect to MongoDB: {e}') from e
+
+def get_collection(database:str, collection:str, codec_options=None):
+    """
+    The function `get_collection` returns the `Collection` object for a collection of a MongoDB
+    database. Collection objects are cached per connection string, so hot helpers skip rebuilding the
+    `client[database][collection]` wrappers on every call.
+    
+    :param database: The name of the MongoDB database where the collection is located
+    :type database: str
+    :param collection: The name of the collection to return
+    :type collection: str
+    :param codec_options: The `codec_options` parameter, when given, is the BSON `CodecOptions` the
+    returned collection decodes documents with, defaults to None (optional)
+    :return: The cached `Collection` object, or its cached copy using `codec_options`.
+    """
+    # `CodecOptions` holding a `TypeRegistry` aren't hashable, they are keyed on their identity. The
+    # cached copy references its options, so their id can't be reused while the entry exists.
+    key = (_connection_string(), database, collection, None if codec_options is None else id(codec_options))
+    cached = _collections.get(key)
+    if cached is None:
+        if codec_options is None:
+            db, _ = connect_to_mongodb(database)
+            cached = _collections.setdefault(key, db[collection])
+        else:
+            cached = _collections.setdefault(key, get_collection(database, collection).with_options(codec_options=codec_options))
+    return cached
 
 def close_mongodb_connection(client:MongoClient):
     """
     The function `close_mongodb_connection` takes a `MongoClient` object as input and closes the
-    connection if the object is not `None`.
+    connection if the object is not `None`. The helpers of this package never call it: the shared
+    client is closed at interpreter shutdown. Closing it explicitly drops it from the cache, so the
+    next `connect_to_mongodb` call creates a fresh client.
     
     :param client: The `client` parameter in the `close_mongodb_connection` function is expected to be
     an instance of `MongoClient`, which is typically used to establish a connection to a MongoDB
@@ -38,6 +217,13 @@ def close_mongodb_connection(client:MongoClient):
     :type client: MongoClient
     """
     if client:
+        with _clients_lock:
+            for connection_string, cached in list(_clients.items()):
+                if cached is client:
+                    del _clients[connection_string]
+            for key, cached in list(_collections.items()):
+                if cached.database.client is client:
+                    del _collections[key]
         client.close()
 
 
@@ -57,51 +243,107 @@ def next_record_identifier_value(database, collection):
     :return: The function `next_record_identifier_value` returns the incremented value of the tally field for the
     specified collection in the MongoDB database. If the incrementor document for the collection exists,
     it retrieves the current tally value, increments it by 1, and returns the updated value. If the
-    incrementor document does not exist, it initializes a new document with a tally value of 1 and
-    returns 1.
+    incrementor document does not exist, it is upserted by the same atomic update with a tally value of
+    1 and 1 is returned. When `MONGOPH_ID_BLOCK_SIZE` is greater than 1, identifiers are handed out from blocks
+    reserved with `next_record_identifier_values`, so only one call per block reaches MongoDB.
     """
+    if _ID_BLOCK_SIZE > 1:
+        return _id_pool.next(database, collection, _ID_BLOCK_SIZE)
     try:
-        db, client = connect_to_mongodb(database)
+        incrementor = get_collection(database, _INCREMENTOR_COLLECTION).find_one_and_update(
+            {'_id': collection},
+            _INCREMENTOR_UPDATE,
+            projection=_INCREMENTOR_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        logger.debug("Generated incrementor ID for %s: %s", collection, incrementor['tally'])
+        return incrementor['tally']
+    except ConnectionFailure as e:
+        raise ValueError(f"Database connection failure: {e}") from e
+    except OperationFailure as e:
+        raise ValueError(f"Database operation failure: {e}") from e
 
-        incrementor_collection = os.getenv('MONGOPH_INCREMENTOR_COLLECTION', 'incrementors')
 
-        incrementor = db[incrementor_collection].find_one_and_update(
+def next_record_identifier_values(database, collection, count:int):
+    """
+    The function `next_record_identifier_values` reserves `count` consecutive incrementor IDs for a
+    collection with a single atomic `$inc` on its tally, instead of one round-trip per ID.
+    
+    :param database: The name of the MongoDB database holding the incrementor collection
+    :param collection: The name of the collection the IDs are reserved for
+    :param count: The number of IDs to reserve, it should be a positive integer
+    :type count: int
+    :return: A `range` over the reserved IDs.
+    """
+    if count < 1:
+        raise ValueError('count should be a positive integer')
+    try:
+        incrementor = get_collection(database, _INCREMENTOR_COLLECTION).find_one_and_update(
             {'_id': collection},
-            {'$inc': {'tally': 1}},
-            projection={'tally': True},
-            return_document=True
+            {'$inc': {'tally': count}},
+            projection=_INCREMENTOR_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
-
-        if incrementor:
-            print(f"Generated incrementor ID for {collection}: {incrementor['tally']}")
-            close_mongodb_connection(client)
-            return incrementor['tally']
-        else:
-            db[incrementor_collection].insert_one({'_id': collection, 'tally': 1})
-            close_mongodb_connection(client)
-            print(f"Initialized incrementor ID for {collection}: 1")
-            return 1
+        end = incrementor['tally']
+        return range(end - count + 1, end + 1)
     except ConnectionFailure as e:
-        raise ValueError(f"Database connection failure: {e}")
+        raise ValueError(f"Database connection failure: {e}") from e
     except OperationFailure as e:
-        raise ValueError(f"Database operation failure: {e}")
-    finally:
-        close_mongodb_connection(client)
+        raise ValueError(f"Database operation failure: {e}") from e
+
+
+class _IdPool:
+    """
+    The class `_IdPool` hands out incrementor IDs from blocks reserved with
+    `next_record_identifier_values`, reserving a new block once the current one is exhausted. Each
+    collection has its own lock, so the refill of a block doesn't hold up the other collections.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def next(self, database, collection, block_size:int):
+        key = (database, collection)
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+        with lock:
+            block = self._blocks.get(key)
+            identifier = next(block, None) if block is not None else None
+            if identifier is None:
+                block = iter(next_record_identifier_values(database, collection, block_size))
+                self._blocks[key] = block
+                identifier = next(block)
+            return identifier
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+_id_pool = _IdPool()
 
 
 def get_reference_key() :
     """
     The function `get_reference_key` returns the value of the environment variable
-    'MONGOPH_REFERENCE_KEY' or 'record_id' if the environment variable is not set.
+    'MONGOPH_REFERENCE_KEY' or 'record_id' if the environment variable is not set. The variable is read
+    once at import, see `refresh_env`.
     :return: The function `get_reference_key()` is returning the value of the environment variable
     'MONGOPH_REFERENCE_KEY' if it is set, otherwise it is returning the default value 'record_id'.
     """
-    return os.getenv('MONGOPH_REFERENCE_KEY', 'record_id')
+    return _REFERENCE_KEY
 
 def collection_exist(database,collection,create_it=False):
     """
     The function `collection_exist` checks if a collection exists in a MongoDB database and optionally
-    creates it if it doesn't.
+    creates it if it doesn't. The name is filtered server-side, so only the matching collection (if any)
+    is sent back instead of the whole catalog.
     
     :param database: The `database` parameter in the `collection_exist` function is a string that
     represents the name of the MongoDB database where the collection is located or should be created
@@ -116,42 +358,104 @@ def collection_exist(database,collection,create_it=False):
     collection does not exist, it will attempt to create the collection before returning the result.
     """
     try:
-        db, client = connect_to_mongodb(database)
-        in_collection_list =  collection in db.list_collection_names()
+        db, _ = connect_to_mongodb(database)
+        in_collection_list = bool(db.list_collection_names(filter={'name': collection}))
         if not in_collection_list and create_it:
             add_collection(database,collection)
-        close_mongodb_connection(client)
         return in_collection_list 
     except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
-        raise ValueError('Database operation faillure: {e}')
+        raise ValueError(f'Database operation failure: {e}') from e
 
 
 def add_collection(database,collection):
     """
-    The function `add_collection` attempts to retrieve the next record identifier value from a database
-    collection and returns a boolean indicating whether the operation was successful.
+    The function `add_collection` creates a collection in a MongoDB database with a single
+    `create` command, without the `listCollections` check PyMongo makes by default, and returns a
+    boolean indicating whether the operation was successful. Creating a collection that already exists,
+    e.g. when two processes race to create it, is not an error.
     
-    :param database: The `database` parameter in the `add_collection` function is typically a reference
-    to the database where the collection will be added. This could be a connection object, database
-    name, or any other identifier that allows the function to interact with the database
+    :param database: The `database` parameter in the `add_collection` function is the name of the
+    MongoDB database where the collection will be added
     :param collection: The `collection` parameter in the `add_collection` function represents the name
-    of the collection in the database where you want to add a new record. It is the specific group of
+    of the collection in the database that you want to create. It is the specific group of
     documents within a database that is used to store related data
-    :return: The function `add_collection` is returning a boolean value based on the result of
-    `next_record_identifier_value(database, collection)`. If the `next_record_identifier_value` function
-    returns a truthy value (i.e., not 0), then the function will return `True`. Otherwise, it will
-    return `False`.
+    :return: The function `add_collection` returns `True` once the collection exists.
     """
     try:
-        tally = next_record_identifier_value(database,collection) #to 1 but with no record ! update it later to have 0 as first value
-        return bool(tally)
-    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
-        raise ValueError('Database operation faillure: {e}')
+        db, _ = connect_to_mongodb(database)
+        db.create_collection(collection, check_exists=False)
+        return True
+    except CollectionInvalid:
+        return True
+    except OperationFailure as e:
+        # 48 NamespaceExists: the collection already exists.
+        if e.code == 48:
+            return True
+        raise ValueError(f'Database operation failure: {e}') from e
+    except (ConnectionFailure, AutoReconnect) as e:
+        raise ValueError(f'Database operation failure: {e}') from e
+
+
+@ttl_cache(maxsize=1024, ttl=30)
+def _index_names(database, collection):
+    """
+    The function `_index_names` returns the names of the indexes defined on a collection. Only the
+    names are kept from `listIndexes`, without building the `index_information()` spec dicts. Results are
+    cached for 30 seconds per `(database, collection)` so repeated index checks skip the round-trip;
+    `create_index_on_collection` invalidates the entry when it adds an index.
+    
+    :param database: The name of the MongoDB database where the collection is located
+    :param collection: The name of the collection whose indexes are listed
+    :return: A `frozenset` of index names.
+    """
+    return frozenset(index['name'] for index in get_collection(database, collection).list_indexes())
+
+def _index_direction(index_type:str):
+    """
+    The function `_index_direction` maps an index type name of `INDEX_TYPES` to the PyMongo index
+    direction.
+    
+    :param index_type: One of 'ascending', 'descending', 'text' or 'hashed'
+    :type index_type: str
+    :return: The PyMongo index direction, a ValueError is raised for an unknown type.
+    """
+    try:
+        return INDEX_TYPES[index_type]
+    except KeyError:
+        raise ValueError(f'Unknown index type {index_type!r}, expected one of: {", ".join(INDEX_TYPES)}') from None
 
+def _has_index(database, collection, keys, name=None):
+    """
+    The function `_has_index` tells whether a collection has an index on `keys`, named `name` when it
+    is given. Text indexes are matched on their weighted fields, as MongoDB stores them under `_fts`.
+    
+    :param database: The name of the MongoDB database where the collection is located
+    :param collection: The name of the collection whose indexes are listed
+    :param keys: The `(field, direction)` pairs of the index
+    :param name: The name the index must have, any name is accepted when None (optional)
+    :return: True when a matching index exists.
+    """
+    try:
+        for index in get_collection(database, collection).list_indexes():
+            if name is not None and index['name'] != name:
+                continue
+            if any(direction == TEXT for _, direction in keys):
+                matches = (index['key'].get('_fts') == 'text'
+                           and set(index.get('weights', {})) == {field for field, _ in keys})
+            else:
+                matches = list(index['key'].items()) == list(keys)
+            if matches:
+                return True
+        return False
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure: {e}') from e
 
-def create_index_on_collection(database,collection, index_name):
+def create_index_on_collection(database,collection, index_name, index_type='ascending'):
     """
-    The function creates a text index on a specified collection in a MongoDB database.
+    The function creates an index on a specified collection in a MongoDB database. `create_index`
+    is a no-op on the server when an identical index already exists, so no existence check is made
+    beforehand. An index already named `<collection>_<index_name>` with another type, e.g. the text
+    indexes created by older releases, is kept as is: a warning is logged and False is returned.
     
     :param database: The `database` parameter is the name of the MongoDB database where the collection
     is located
@@ -160,20 +464,29 @@ def create_index_on_collection(database,collection, index_name):
     specific subset of data within the database where you want to add the index
     :param index_name: The `index_name` parameter in the `create_index_on_collection` function is the
     name of the index that you want to create on a specific field in a MongoDB collection
-    :return: True
+    :param index_type: The `index_type` parameter is the kind of index to create: 'ascending',
+    'descending', 'text' or 'hashed'. A regular btree index is much cheaper to build and maintain than
+    a text index, and MongoDB allows a single text index per collection, so only pass 'text' when
+    full-text search is needed, defaults to 'ascending' (optional)
+    :return: True once the requested index exists, False when its name is taken by another index.
     """
+    direction = _index_direction(index_type)
+    index_key = f'{collection}_{index_name}'
     try:
-        db, client = connect_to_mongodb(database)
-        indexes = db[collection].index_information()
-        index_key = f'{collection}_{index_name}'
-        if not indexes.get(index_key, None):
-            db[collection].create_index([(index_name, 'text')], name=index_key)
-        close_mongodb_connection(client)
-        return True
+        get_collection(database, collection).create_index([(index_name, direction)], name=index_key)
+    except OperationFailure as e:
+        # 85 IndexOptionsConflict / 86 IndexKeySpecsConflict: the name is already taken by an index.
+        if e.code not in (85, 86):
+            raise ValueError(f'Database operation failure: {e}') from e
+        if not _has_index(database, collection, [(index_name, direction)], name=index_key):
+            logger.warning("Index %s of %s has another key, the %s index on %s was not created", index_key, collection, index_type, index_name)
+            return False
     except Exception as e:
-        raise ValueError('Database operation faillure: {e}')
+        raise ValueError(f'Database operation failure: {e}') from e
+    _index_names.cache.pop((database, collection))
+    return True
     
-def check_index_on_collection(database,collection, index_name, create_it=False):
+def check_index_on_collection(database,collection, index_name, create_it=False, index_type='ascending'):
     """
     The function checks for the existence of an index on a collection in a MongoDB database and creates
     it if specified.
@@ -190,17 +503,149 @@ def check_index_on_collection(database,collection, index_name, create_it=False):
     flag that indicates whether the function should create the specified index if it does not already
     exist in the collection. If `create_it` is set to `True`, the function will attempt to create the
     index if it, defaults to False (optional)
+    :param index_type: The `index_type` parameter is the kind of index created when `create_it` is set,
+    see `create_index_on_collection`, defaults to 'ascending' (optional)
     :return: The function `check_index_on_collection` returns a boolean value indicating whether the
     specified index exists in the collection or not.
     """
     try:
-        db, client = connect_to_mongodb(database)
-        indexes = db[collection].index_information()
         index_key = f'{collection}_{index_name}'
-        have_index = index_key in indexes
+        have_index = index_key in _index_names(database, collection)
         if not have_index and create_it :
-            create_index_on_collection(database,collection,index_name)
-        close_mongodb_connection(client)
+            create_index_on_collection(database,collection,index_name,index_type)
         return have_index
     except Exception as e:
-        raise ValueError('Database operation faillure: {e}')
\ No newline at end of file
+        raise ValueError(f'Database operation failure: {e}') from e
+
+def _index_models(collection, indexes, index_type='ascending'):
+    """
+    The function `_index_models` builds the `IndexModel` list for `createIndexes`, naming every index
+    `<collection>_<field>` like `create_index_on_collection` does.
+    
+    :param collection: The name of the collection the indexes belong to
+    :param indexes: An iterable of field names to index
+    :param index_type: The kind of index to create, see `create_index_on_collection`
+    :return: A list of `IndexModel`.
+    """
+    direction = _index_direction(index_type)
+    return [
+        IndexModel([(index_name, direction)], name=f'{collection}_{index_name}')
+        for index_name in indexes
+    ]
+
+def ensure_collection(database, collection, indexes=(), index_type='ascending'):
+    """
+    The function `ensure_collection` makes sure a collection exists in a MongoDB database along with
+    its indexes. It replaces the `collection_exist(..., create_it=True)` then
+    `create_index_on_collection` sequence: the collection is created with one command and every index
+    is sent in a single `createIndexes` command.
+    
+    :param database: The `database` parameter is the name of the MongoDB database where the collection
+    is located
+    :param collection: The `collection` parameter is the name of the collection to create if missing
+    :param indexes: The `indexes` parameter is an iterable of field names to index, each index is named
+    `<collection>_<field>` like in `create_index_on_collection`, defaults to () (optional)
+    :param index_type: The `index_type` parameter is the kind of index to create, see
+    `create_index_on_collection`, defaults to 'ascending' (optional)
+    :return: True
+    """
+    try:
+        add_collection(database, collection)
+        indexes = list(indexes)
+        if indexes:
+            get_collection(database, collection).create_indexes(_index_models(collection, indexes, index_type))
+            _index_names.cache.pop((database, collection))
+        return True
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure: {e}') from e
+
+
+def bulk_ensure_indexes(database, indexes:dict, index_type='ascending'):
+    """
+    The function `bulk_ensure_indexes` creates the indexes of several collections of a MongoDB database,
+    sending one `createIndexes` command per collection whatever the number of indexes.
+    
+    :param database: The `database` parameter is the name of the MongoDB database where the collections
+    are located
+    :param indexes: The `indexes` parameter maps each collection name to the field names to index
+    :type indexes: dict
+    :param index_type: The `index_type` parameter is the kind of index to create, see
+    `create_index_on_collection`, defaults to 'ascending' (optional)
+    :return: True
+    """
+    try:
+        for collection, index_names in indexes.items():
+            index_names = list(index_names)
+            if index_names:
+                get_collection(database, collection).create_indexes(_index_models(collection, index_names, index_type))
+                _index_names.cache.pop((database, collection))
+        return True
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure: {e}') from e
+
+
+def bulk_next_record_identifier_values(database, counts:dict):
+    """
+    The function `bulk_next_record_identifier_values` reserves incrementor IDs for several collections
+    at once, with one atomic `$inc` per collection whatever the number of IDs. The `$inc`s of the
+    different collections are sent concurrently from a thread pool, so the call takes about one
+    round-trip instead of one per collection.
+    
+    :param database: The name of the MongoDB database holding the incrementor collection
+    :param counts: The `counts` parameter maps each collection name to the number of IDs to reserve
+    :type counts: dict
+    :return: A dict mapping each collection name to the `range` of its reserved IDs.
+    """
+    if len(counts) <= 1:
+        return {
+            collection: next_record_identifier_values(database, collection, count)
+            for collection, count in counts.items()
+        }
+    with ThreadPoolExecutor(max_workers=min(len(counts), _BULK_MAX_WORKERS)) as executor:
+        futures = {
+            collection: executor.submit(next_record_identifier_values, database, collection, count)
+            for collection, count in counts.items()
+        }
+        return {collection: future.result() for collection, future in futures.items()}
+
+def ensure_sort_index(database:str, collection:str):
+    """
+    The function `ensure_sort_index` creates the `created_at` descending index backing the default sort
+    of `finds`, once per collection and process. Without it MongoDB sorts the matching documents in
+    memory, and fails once they exceed its sort memory limit. An index on the same key created under
+    another name is accepted. When the index can't be created because its name is taken by an index on
+    another key, a warning is logged and False is returned.
+    
+    :param database: The name of the MongoDB database where the collection is located
+    :type database: str
+    :param collection: The name of the collection to index
+    :type collection: str
+    :return: True once the index exists, False when it can't be created.
+    """
+    if (database, collection) in _sort_indexes:
+        return _sort_indexes[(database, collection)]
+    created = True
+    try:
+        get_collection(database, collection).create_index([('created_at', DESCENDING)])
+    except OperationFailure as e:
+        # 85 IndexOptionsConflict / 86 IndexKeySpecsConflict: the key or the name is already indexed.
+        if e.code not in (85, 86):
+            raise ValueError(f'Database operation failure: {e}') from e
+        created = _has_index(database, collection, [('created_at', DESCENDING)])
+        if not created:
+            logger.warning("The created_at index of %s conflicts with an existing index and was not created", collection)
+    except Exception as e:
+        raise ValueError(f'Database operation failure: {e}') from e
+    _sort_indexes[(database, collection)] = created
+    return created
+
+def _auto_ensure_sort_index(database:str, collection:str):
+    """
+    The function `_auto_ensure_sort_index` calls `ensure_sort_index` when the `MONGOPH_ENSURE_SORT_INDEX`
+    environment variable is set to 1, it is used by the read helpers sorting on `created_at`.
+    
+    :param database: The name of the MongoDB database where the collection is located
+    :param collection: The name of the collection read
+    """
+    if _ENSURE_SORT_INDEX and (database, collection) not in _sort_indexes:
+        ensure_sort_index(database, collection)
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import weakref
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure, OperationFailure
+from . import db_helper
+
+# PyMongo ships its own asyncio client since 4.9, Motor provides the same API for older releases.
+try:
+    from pymongo import AsyncMongoClient  # type: ignore[attr-defined]
+except ImportError:
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    except ImportError:
+        AsyncMongoClient = None
+
+_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def _reset_after_fork():
+    """
+    The function `_reset_after_fork` drops the async clients inherited from the parent process, like
+    `db_helper._reset_after_fork` does for the sync ones.
+    """
+    global _clients
+    _clients = weakref.WeakKeyDictionary()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _get_async_client(connection_string:str):
+    """
+    The function `_get_async_client` returns the `AsyncMongoClient` (or Motor `AsyncIOMotorClient`)
+    shared by the coroutines of the running event loop for a connection string. An async client is bound
+    to the loop it was created on, so one client is cached per event loop.
+    
+    :param connection_string: The MongoDB connection string the client is created (and cached) for
+    :type connection_string: str
+    :return: The shared `AsyncMongoClient` for `connection_string` on the running loop.
+    """
+    if AsyncMongoClient is None:
+        raise ImportError('The async helpers require pymongo>=4.9 (AsyncMongoClient) or motor')
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(connection_string)
+    if client is None:
+        client = AsyncMongoClient(connection_string, **db_helper._client_options())
+        clients[connection_string] = client
+    return client
+
+async def aconnect_to_mongodb(database_name:str):
+    """
+    The function `aconnect_to_mongodb` is the asyncio counterpart of `connect_to_mongodb`: it returns
+    the database object and the `AsyncMongoClient` shared on the running event loop.
+    
+    :param database_name: The name of the MongoDB database to which you want to connect
+    :type database_name: str
+    :return: The function `aconnect_to_mongodb` returns two values: `db` the database object for the
+    specified database name, and `client` the async MongoDB client.
+    """
+    connection_string = db_helper._connection_string()
+    try:
+        client = _get_async_client(connection_string)
+        return client[database_name], client
+    except ImportError:
+        raise
+    except Exception as e:
+        raise ValueError(f'Failed to connect to MongoDB: {e}') from e
+
+def get_async_collection(database:str, collection:str, codec_options=None):
+    """
+    The function `get_async_collection` returns the async collection object for a collection of a
+    MongoDB database, from the client shared on the running event loop. It must be called from a
+    coroutine.
+    
+    :param database: The name of the MongoDB database where the collection is located
+    :type database: str
+    :param collection: The name of the collection to return
+    :type collection: str
+    :param codec_options: The BSON `CodecOptions` the collection decodes documents with, defaults to None
+    (optional)
+    :return: The async `Collection` object.
+    """
+    connection_string = db_helper._connection_string()
+    try:
+        db = _get_async_client(connection_string)[database]
+        return db.get_collection(collection, codec_options=codec_options)
+    except ImportError:
+        raise
+    except Exception as e:
+        raise ValueError(f'Failed to connect to MongoDB: {e}') from e
+
+async def anext_record_identifier_value(database, collection):
+    """
+    The function `anext_record_identifier_value` is the asyncio counterpart of
+    `next_record_identifier_value`. Many IDs can be generated concurrently on a single thread, e.g.
+    `await asyncio.gather(*[anext_record_identifier_value(db, c) for c in collections])`.
+    
+    :param database: The name of the MongoDB database holding the incrementor collection
+    :param collection: The name of the collection for which the ID is generated
+    :return: The incremented tally of the collection, 1 on the first call.
+    """
+    try:
+        db, _ = await aconnect_to_mongodb(database)
+        incrementor = await db[db_helper._INCREMENTOR_COLLECTION].find_one_and_update(
+            {'_id': collection},
+            db_helper._INCREMENTOR_UPDATE,
+            projection=db_helper._INCREMENTOR_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return incrementor['tally']
+    except ConnectionFailure as e:
+        raise ValueError(f"Database connection failure: {e}") from e
+    except OperationFailure as e:
+        raise ValueError(f"Database operation failure: {e}") from e
+
+async def anext_record_identifier_values(database, collection, count:int):
+    """
+    The function `anext_record_identifier_values` is the asyncio counterpart of
+    `next_record_identifier_values`: it reserves `count` consecutive IDs with a single atomic `$inc`.
+    
+    :param database: The name of the MongoDB database holding the incrementor collection
+    :param collection: The name of the collection the IDs are reserved for
+    :param count: The number of IDs to reserve, it should be a positive integer
+    :type count: int
+    :return: A `range` over the reserved IDs.
+    """
+    if count < 1:
+        raise ValueError('count should be a positive integer')
+    try:
+        db, _ = await aconnect_to_mongodb(database)
+        incrementor = await db[db_helper._INCREMENTOR_COLLECTION].find_one_and_update(
+            {'_id': collection},
+            {'$inc': {'tally': count}},
+            projection=db_helper._INCREMENTOR_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        end = incrementor['tally']
+        return range(end - count + 1, end + 1)
+    except ConnectionFailure as e:
+        raise ValueError(f"Database connection failure: {e}") from e
+    except OperationFailure as e:
+        raise ValueError(f"Database operation failure: {e}") from e
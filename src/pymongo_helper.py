@@ -1,19 +1,180 @@
+import copy
 import datetime
+import functools
+import hashlib
+import itertools
+import pickle
+import sys
 import uuid
+import warnings
+from typing import Optional, Union
 import pymongo
-from pymongo.errors import ConnectionFailure, OperationFailure,AutoReconnect,DuplicateKeyError
-from db_helper import close_mongodb_connection,connect_to_mongodb,get_reference_key,next_record_identifier_value
-from src.utils import datetime_formater
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import ConnectionFailure, OperationFailure,AutoReconnect
+from .db_helper import _auto_ensure_sort_index,_read_cache,get_collection,get_reference_key,next_record_identifier_value,next_record_identifier_values
+from .utils import DATETIME_CODEC_OPTIONS, RAW_CODEC_OPTIONS, json_dumps, make_formatter
 
 PROJECTION = {'_id': False, 'id': True}
-CRITERIA = {}
+CRITERIA: dict = {}
 SORT = [("created_at", pymongo.DESCENDING)]
 
-def find_one(database:str,collection:str, criteria:dict=CRITERIA, projection:dict=PROJECTION):
+# Formats the timestamps the write helpers stamp on the documents they return.
+_format_timestamps = make_formatter(('created_at', 'updated_at'))
+
+# Generation of each written (database, collection), a new unique value per `_invalidate_reads` call.
+# A read only caches its result when the generation of its collection didn't change while it ran.
+_read_generations: dict = {}
+_generation_counter = itertools.count()
+
+# Stages after which the documents no longer have the shape of the stored ones, or no document is
+# returned at all (`$out`, `$merge`).
+_SHAPING_STAGES = frozenset((
+    '$project', '$group', '$count', '$replaceRoot', '$replaceWith', '$unset', '$facet', '$bucket',
+    '$bucketAuto', '$sortByCount', '$out', '$merge',
+))
+
+
+class PerformanceWarning(UserWarning):
+    """
+    The class `PerformanceWarning` is the warning emitted when a helper is about to send whole documents
+    over the wire, e.g. an aggregation without any `$project` stage.
+    """
+
+def _caller_stacklevel():
+    """
+    The function `_caller_stacklevel` returns the `stacklevel` making a warning point at the first
+    caller outside this module, whatever the number of helpers and decorators it went through.
+    
+    :return: The `stacklevel` to pass to `warnings.warn` from the calling function.
+    """
+    level = 1
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+        level += 1
+    return level
+
+def _check_projection(projection:Optional[dict]):
+    """
+    The function `_check_projection` rejects a missing or empty projection, which would ship whole
+    documents over the wire. Pass the fields to return instead, e.g. `{'_id': 0, 'name': 1, 'code': 1}`.
+    
+    :param projection: The projection given to a read function
+    """
+    if not projection:
+        raise ValueError("explicit projection required, e.g. {'_id': 0, 'field': 1}")
+
+def _cached_read(function):
+    """
+    The function `_cached_read` is a decorator caching the result of a read helper for
+    `MONGOPH_READ_CACHE_TTL` seconds, keyed on the database, the collection and a digest of the other
+    arguments. The cache is disabled when the TTL is 0, the default. Cached results are deep-copied in
+    and out, so callers may mutate what they get back. The writes of this module drop the entries of
+    their collection through `_invalidate_reads`; an aggregation reading other collections (`$lookup`)
+    only sees their changes once its entry expires. A result is not cached when its collection was
+    written while the query ran, as it may predate the write.
+    
+    :param function: The read helper, its first two parameters must be `database` and `collection`
+    :return: The wrapped read helper.
+    """
+    missing = object()
+
+    @functools.wraps(function)
+    def wrapper(database, collection, *args, **kwargs):
+        if _read_cache.ttl <= 0:
+            return function(database, collection, *args, **kwargs)
+        try:
+            query = pickle.dumps((function.__name__, args, sorted(kwargs.items())))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return function(database, collection, *args, **kwargs)
+        key = (database, collection, hashlib.blake2b(query).digest())
+        result = _read_cache.get(key, missing)
+        if result is missing:
+            generation = _read_generations.get((database, collection))
+            result = function(database, collection, *args, **kwargs)
+            if _read_generations.get((database, collection)) == generation:
+                _read_cache.set(key, copy.deepcopy(result))
+                # A write may invalidate between the check and the set, the entry is dropped again then.
+                if _read_generations.get((database, collection)) != generation:
+                    _read_cache.pop(key)
+            return result
+        return copy.deepcopy(result)
+    return wrapper
+
+def _wrap_mongo_errors(function):
+    """
+    The function `_wrap_mongo_errors` is a decorator turning the PyMongo errors raised by a helper into
+    `ValueError('Database operation failure ...')`, the original error being chained as its cause.
+    
+    :param function: The helper to wrap
+    :return: The wrapped helper.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+            error = ValueError(f'Database operation failure {e}')
+            # Set explicitly: the mypyc build drops the cause of `raise ... from e` in this closure.
+            error.__cause__ = e
+            raise error
+    return wrapper
+
+def _chunkable_in_field(criteria:dict, chunk_size:int):
+    """
+    The function `_chunkable_in_field` returns the field of `criteria` matched with nothing but an `$in`
+    list longer than `chunk_size`, or `None`. The other conditions of `criteria` still apply to each
+    chunk, so the chunked deletes match the same documents.
+    
+    :param criteria: The criteria of a write helper
+    :param chunk_size: The maximum number of `$in` values per command
+    :return: The name of the field to chunk on, or `None`.
+    """
+    for field, condition in criteria.items():
+        if isinstance(condition, dict) and len(condition) == 1 and isinstance(condition.get('$in'), (list, tuple)):
+            if len(condition['$in']) > chunk_size:
+                return field
+    return None
+
+def _stamped_update(update_operation:str, data:dict):
+    """
+    The function `_stamped_update` builds the update document applying `update_operation` with `data`
+    and stamping `updated_at` with `$currentDate`, so the timestamp comes from the server clock at
+    write time instead of the clock of each client. An `updated_at` already in `data`, e.g. in a
+    document read earlier and saved back, is left out of the operand as both would update the same path.
+    
+    :param update_operation: The MongoDB update operator, e.g. '$set', '$push' or '$pull'
+    :param data: The operand of the update operator
+    :return: The update document.
+    """
+    if update_operation == '$currentDate':
+        return {'$currentDate': {**data, 'updated_at': True}}
+    if 'updated_at' in data:
+        data = {key: value for key, value in data.items() if key != 'updated_at'}
+        if not data:
+            return {'$currentDate': {'updated_at': True}}
+    return {update_operation: data, '$currentDate': {'updated_at': True}}
+
+def _invalidate_reads(database:str, collection:str):
+    """
+    The function `_invalidate_reads` drops the cached read results of a collection after it was written.
+    The generation of the collection is bumped first, so the reads running concurrently don't cache
+    their result.
+    
+    :param database: The name of the MongoDB database the collection belongs to
+    :param collection: The name of the written collection
+    """
+    _read_generations[(database, collection)] = next(_generation_counter)
+    if _read_cache.ttl > 0:
+        _read_cache.evict(lambda key: key[0] == database and key[1] == collection)
+
+@_cached_read
+@_wrap_mongo_errors
+def find_one(database:str,collection:str, criteria:dict=CRITERIA, projection:dict=PROJECTION, raw:bool=False):
     """
     The function `find_one` connects to a MongoDB database, retrieves one document from a specified
-    collection based on given criteria and projection, and formats the result using a datetime formatter
-    before returning it.
+    collection based on given criteria and projection, with its datetimes formatted as strings while the
+    BSON is decoded (see `DATETIME_CODEC_OPTIONS`).
     
     :param database: The `database` parameter in the `find_one` function refers to the name of the
     MongoDB database you want to connect to and perform the find operation on. It is a required
@@ -28,20 +189,22 @@ def find_one(database:str,collection:str, criteria:dict=CRITERIA, projection:dic
     :type criteria: dict
     :param projection: The `projection` parameter in the `find_one` function is used to specify which
     fields should be included or excluded in the query result. It is a dictionary where the keys
-    represent the fields to be included (with a value of 1) or excluded (with a value of 0) in
+    represent the fields to be included (with a value of 1) or excluded (with a value of 0) in the
+    result. It can't be `None` or empty: whole documents are never fetched implicitly
     :type projection: dict
-    :return: The function `find_one` is returning the result of the MongoDB query after formatting the
-    datetime if the data is found, or it returns `None` if no data is found.
+    :param raw: Whether to return the document as a `RawBSONDocument` holding the BSON bytes, without
+    decoding nor formatting its fields, defaults to False (optional)
+    :type raw: bool
+    :return: The function `find_one` is returning the result of the MongoDB query with its datetimes
+    formatted if the data is found, or it returns `None` if no data is found.
     """
-    try:
-        db,client = connect_to_mongodb(database)
-        data = db[collection].find_one(criteria, projection)
-        close_mongodb_connection(client)
-        return datetime_formater(data) if data else data
-    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
-        raise ValueError(f'Database operation failure {e}')
+    # Same path as `finds`, a negative limit fetches a single batch and closes the cursor like
+    # `Collection.find_one` does.
+    return next(finds_iter(database, collection, projection, criteria, None, -1, raw=raw), None)
             
-def finds(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA,sort:list=SORT, limit=0,pager:dict=None):
+@_cached_read
+@_wrap_mongo_errors
+def finds(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA,sort:Optional[list]=SORT, limit:int=0,pager:Optional[dict]=None, batch_size:int=0, raw:bool=False, hint:Optional[Union[str, list]]=None, *, skip:int=0):
     """
     This Python function retrieves data from a MongoDB database based on specified criteria, projection,
     sorting, and pagination parameters.
@@ -56,7 +219,7 @@ def finds(database:str, collection:str, projection:dict=PROJECTION, criteria:dic
     :param projection: The `projection` parameter in the `finds` function is used to specify which
     fields should be included or excluded in the query results. It is a dictionary where the keys
     represent the fields to include or exclude, and the values indicate whether to include (1) or
-    exclude (0) the field
+    exclude (0) the field. It can't be `None` or empty: whole documents are never fetched implicitly
     :type projection: dict
     :param criteria: The `criteria` parameter in the `finds` function is used to specify the conditions
     that must be met for a document to be included in the result set. It is a dictionary that contains
@@ -65,7 +228,9 @@ def finds(database:str, collection:str, projection:dict=PROJECTION, criteria:dic
     :type criteria: dict
     :param sort: The `sort` parameter in the `finds` function is used to specify the order in which the
     documents should be returned from the MongoDB collection. It is a list that defines the fields to
-    sort by and the sort order (ascending or descending) for each field
+    sort by and the sort order (ascending or descending) for each field. Unless an index whose keys
+    start with the sort fields is used, MongoDB sorts the results in memory; pass `None` when the order
+    doesn't matter to skip the sort, defaults to `SORT` (optional)
     :type sort: list
     :param limit: The `limit` parameter in the `finds` function specifies the maximum number of
     documents that the MongoDB query will return. If the `limit` parameter is not specified, the default
@@ -74,27 +239,117 @@ def finds(database:str, collection:str, projection:dict=PROJECTION, criteria:dic
     :param pager: The `pager` parameter is a dictionary that can contain the keys `skip` and `limit`.
     These keys are used for pagination when querying a MongoDB collection. The `skip` key specifies the
     number of documents to skip before returning results, while the `limit` key specifies the maximum
-    number of documents
+    number of documents. When given, it overrides `skip` and `limit`
     :type pager: dict
+    :param batch_size: The `batch_size` parameter is the number of documents fetched per round-trip
+    while the cursor is consumed. With 0 the server decides: 101 documents in the first batch, then
+    batches of up to 16 MiB. Set it when a result set is known to be large, so fewer `getMore`
+    round-trips are paid, or to bound the memory of each batch, defaults to 0 (optional)
+    :type batch_size: int
+    :param raw: The `raw` parameter, when `True`, returns `RawBSONDocument`s holding the BSON bytes of
+    the documents: nothing is decoded nor formatted, which suits results forwarded as is to a JSON or
+    BSON response, defaults to False (optional)
+    :type raw: bool
+    :param hint: The `hint` parameter is the index MongoDB must use, given by name (e.g.
+    `'created_at_-1'`) or by keys (e.g. `[('created_at', -1)]`). It saves the query planner from trying
+    candidate plans, pick an index supporting both `criteria` and `sort`, defaults to None (optional)
+    :type hint: str or list
+    :param skip: The `skip` keyword-only parameter is the number of documents to skip before returning
+    results, use it with `limit` instead of building a `pager`, defaults to 0 (optional)
+    :type skip: int
     :return: a list of data elements from a MongoDB collection based on the specified criteria,
-    projection, sorting, and pagination parameters. The data elements are formatted using a datetime
-    formatter before being returned.
+    projection, sorting, and pagination parameters. Datetimes are formatted as strings while the BSON is
+    decoded, so no formatting pass runs over the results.
+    """
+    return list(finds_iter(database, collection, projection, criteria, sort, limit, pager, batch_size, raw, hint, skip=skip))
+
+def finds_iter(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA,sort:Optional[list]=SORT, limit:int=0,pager:Optional[dict]=None, batch_size:int=0, raw:bool=False, hint:Optional[Union[str, list]]=None, *, skip:int=0):
+    """
+    The function `finds_iter` takes the same parameters as `finds` but streams the documents instead of
+    returning a list: the returned cursor fetches the documents one batch per round-trip while it is
+    iterated, so at most one batch is held in memory. The results are not cached. Unlike the other
+    helpers, only the errors raised while building the cursor become `ValueError`: the batches are
+    fetched while the caller iterates, so errors raised then (`OperationFailure`, `ExecutionTimeout`,
+    `AutoReconnect`, ...) reach the caller as PyMongo exceptions.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to query
+    :type collection: str
+    :param projection: The fields to include or exclude from the results, it can't be `None` or empty
+    :type projection: dict
+    :param criteria: The conditions the documents must meet
+    :type criteria: dict
+    :param sort: The fields and directions to sort the results by, `None` to skip the sort
+    :type sort: list
+    :param limit: The maximum number of documents to return, 0 means no limit, defaults to 0 (optional)
+    :type limit: int
+    :param pager: A dict with the `skip` and `limit` keys used for pagination
+    :type pager: dict
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :param raw: Whether to yield undecoded `RawBSONDocument`s, defaults to False (optional)
+    :type raw: bool
+    :param hint: The index MongoDB must use, by name or by keys, defaults to None (optional)
+    :type hint: str or list
+    :param skip: The number of documents to skip, defaults to 0 (optional)
+    :type skip: int
+    :return: An iterator over the documents, with their datetimes formatted as strings.
     """
-    db,client = connect_to_mongodb(database)
-    keys_to_check = ['skip', 'limit']
+    _check_projection(projection)
+    codec_options = RAW_CODEC_OPTIONS if raw else DATETIME_CODEC_OPTIONS
     if pager :
-        check_keys = all(key in pager for key in keys_to_check)
-        if not check_keys :
-            raise ValueError('Pager should have skip and limit key vlaue')
-        cursor = db[collection].find(criteria, projection).skip(pager["skip"]).limit(pager["limit"]).sort(sort)
-    else:
-        cursor = db[collection].find(criteria, projection).sort(sort).limit(limit)
-    close_mongodb_connection(client)
-    datas = [datetime_formater(element) for element in cursor]
-    return datas
+        try:
+            skip, limit = pager['skip'], pager['limit']
+        except KeyError:
+            raise ValueError('Pager should have skip and limit keys') from None
+    if sort == SORT:
+        _auto_ensure_sort_index(database, collection)
+    cursor = get_collection(database, collection, codec_options).find(criteria, projection, batch_size=batch_size)
+    if hint:
+        cursor = cursor.hint(hint)
+    if sort:
+        cursor = cursor.sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
+    return cursor.limit(limit)
+
+@_wrap_mongo_errors
+def finds_json(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA,sort:Optional[list]=SORT, limit:int=0,pager:Optional[dict]=None, batch_size:int=0, hint:Optional[Union[str, list]]=None, *, skip:int=0) -> bytes:
+    """
+    The function `finds_json` takes the same parameters as `finds` but returns the documents serialized
+    as a JSON array, ready to be sent by an API handler. The documents are read into a list, then
+    serialized in one call (`orjson` when installed, see `json_dumps`); the results are not cached.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to query
+    :type collection: str
+    :param projection: The fields to include or exclude from the results, it can't be `None` or empty
+    :type projection: dict
+    :param criteria: The conditions the documents must meet
+    :type criteria: dict
+    :param sort: The fields and directions to sort the results by, `None` to skip the sort
+    :type sort: list
+    :param limit: The maximum number of documents to return, 0 means no limit, defaults to 0 (optional)
+    :type limit: int
+    :param pager: A dict with the `skip` and `limit` keys used for pagination
+    :type pager: dict
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :param hint: The index MongoDB must use, by name or by keys, defaults to None (optional)
+    :type hint: str or list
+    :param skip: The number of documents to skip, defaults to 0 (optional)
+    :type skip: int
+    :return: The UTF-8 encoded JSON array of the documents.
+    """
+    return json_dumps(list(finds_iter(database, collection, projection, criteria, sort, limit, pager, batch_size, hint=hint, skip=skip)))
 
  
-def insert_one(database:str, collection:str, data, datalist=True):
+@_wrap_mongo_errors
+def insert_one(database:str, collection:str, data:dict, datalist:bool=True):
     """
     The function `insert_one` inserts a document into a MongoDB collection with additional fields like
     creation timestamp and unique identifiers, and returns either a list of documents or a specific
@@ -113,29 +368,55 @@ def insert_one(database:str, collection:str, data, datalist=True):
     determines whether the function should return a list of data after inserting the new data or just
     the reference key of the inserted data. If `datalist` is set to `True`, the function will return a
     list, defaults to True (optional)
-    :return: If `datalist` is `True`, the function will return the result of calling the `finds`
-    function with the `database` and `collection` parameters. If `datalist` is `False`, the function
-    will return the value associated with the key returned by the `get_reference_key` function from the
-    `data` dictionary.
+    :return: If `datalist` is `True`, the function will return a copy of the inserted document with its
+    datetimes formatted like the read helpers do, no follow-up read is made. If `datalist` is `False`,
+    the function will return the value associated
+    with the key returned by the `get_reference_key` function from the `data` dictionary.
     """
-    try:
-        db ,client = connect_to_mongodb(database)
-        date = datetime.datetime.now()
-        data['created_at'] = date
-        data['updated_at'] = date
-        data['id'] = next_record_identifier_value(database,collection)
-        data[get_reference_key()] = str(uuid.uuid4())
-        db[collection].insert_one(data)
-        close_mongodb_connection(client)
-        if datalist:
-            return finds(database, collection)
-        else:
-            return data[get_reference_key()]
-    except (ConnectionFailure, AutoReconnect, OperationFailure,DuplicateKeyError) as e:
-        raise ValueError(f'Database operation failure {e}')
+    date = datetime.datetime.now(datetime.timezone.utc)
+    data['created_at'] = date
+    data['updated_at'] = date
+    data['id'] = next_record_identifier_value(database,collection)
+    record_id = uuid.uuid4().hex
+    data[get_reference_key()] = record_id
+    get_collection(database, collection).insert_one(data)
+    _invalidate_reads(database, collection)
+    if datalist:
+        return _format_timestamps(dict(data))
+    else:
+        return record_id
+    
+
+def _output_collection(database:str, pipeline:list):
+    """
+    The function `_output_collection` returns the collection written by the final `$out` or `$merge`
+    stage of an aggregation pipeline.
     
+    :param database: The name of the MongoDB database the pipeline runs on
+    :param pipeline: The aggregation stages
+    :return: The `(database, collection)` written by the pipeline, or `None` when it only reads.
+    """
+    if not pipeline:
+        return None
+    stage = pipeline[-1]
+    if '$out' in stage:
+        target = stage['$out']
+    elif '$merge' in stage:
+        target = stage['$merge']
+        if isinstance(target, dict):
+            target = target['into']
+    else:
+        return None
+    if isinstance(target, dict):
+        return target.get('db', database), target['coll']
+    return database, target
 
-def aggregate(database:str,collection:str, pipeline:list):
+@_cached_read
+def _cached_aggregate(database:str, collection:str, pipeline:list, projection:Optional[dict], allow_disk_use:bool, batch_size:int):
+    return list(aggregate_iter(database, collection, pipeline, projection, allow_disk_use, batch_size))
+
+@_wrap_mongo_errors
+def aggregate(database:str,collection:str, pipeline:list, projection:Optional[dict]=None, allow_disk_use:bool=True, batch_size:int=0):
     """
     The function `aggregate` connects to a MongoDB database, performs an aggregation operation on a
     specified collection using a given pipeline, and returns the aggregated data.
@@ -151,24 +432,78 @@ def aggregate(database:str,collection:str, pipeline:list):
     :param pipeline: The `pipeline` parameter in the `aggregate` function is a list of aggregation
     stages that define the operations to be performed on the data in the specified collection in the
     MongoDB database. These stages can include operations like filtering, grouping, sorting, and
-    transforming the data before returning the results. Each stage in
+    transforming the data before returning the results. Each stage works on the output of the previous
+    one, so put the `$match` stages first: indexes are used and fewer documents flow through the
+    pipeline, e.g.
+    `[{'$match': {'status': 'paid'}}, {'$group': {'_id': '$customer', 'total': {'$sum': '$amount'}}}]`
     :type pipeline: list
-    :return: The function `aggregate` is returning a list of datetime objects after aggregating data
-    from the specified collection in the MongoDB database using the provided pipeline.
+    :param projection: The `projection` parameter, when given, is appended to the pipeline as a final
+    `$project` stage so that only the listed fields are sent back: MongoDB strips the other fields
+    before they cross the wire, e.g. `{'_id': 0, 'customer': '$_id', 'total': 1}`, defaults to None
+    (optional)
+    :type projection: dict
+    :param allow_disk_use: The `allow_disk_use` parameter lets the stages exceeding their memory limit,
+    such as a large `$sort` or `$group`, write temporary files instead of failing, defaults to True
+    (optional)
+    :type allow_disk_use: bool
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :return: The function `aggregate` is returning the list of documents, with their datetimes formatted
+    as strings, after aggregating data from the specified collection in the MongoDB database using the
+    provided pipeline. A pipeline ending with `$out` or `$merge` is never served from the read cache,
+    and the cached reads of the collection it writes are dropped.
     """
+    output = _output_collection(database, pipeline)
+    if output is None:
+        return _cached_aggregate(database, collection, pipeline, projection, allow_disk_use, batch_size)
     try:
-        db ,client = connect_to_mongodb(database)
-        datas = [
-            datetime(data) for data in db[collection].aggregate(pipeline)
-        ]
-        close_mongodb_connection(client)
-        return datas
-    except (ConnectionFailure, AutoReconnect, OperationFailure,DuplicateKeyError) as e:
-        raise ValueError(f'Database operation failure {e}')
+        return list(aggregate_iter(database, collection, pipeline, projection, allow_disk_use, batch_size))
+    finally:
+        _invalidate_reads(*output)
+
+@_wrap_mongo_errors
+def aggregate_iter(database:str,collection:str, pipeline:list, projection:Optional[dict]=None, allow_disk_use:bool=True, batch_size:int=0):
+    """
+    The function `aggregate_iter` takes the same parameters as `aggregate` but streams the resulting
+    documents instead of returning a list: the returned cursor fetches them one batch per round-trip
+    while it is iterated. The results are not cached. Like with `finds_iter`, the PyMongo errors raised
+    while iterating the cursor are not turned into `ValueError`.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to aggregate
+    :type collection: str
+    :param pipeline: The aggregation stages, `$match` first
+    :type pipeline: list
+    :param projection: Appended to the pipeline as a final `$project` stage when given, defaults to None
+    (optional)
+    :type projection: dict
+    :param allow_disk_use: Whether the stages may spill to temporary files, defaults to True (optional)
+    :type allow_disk_use: bool
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :return: An iterator over the documents, with their datetimes formatted as strings.
+    """
+    if projection:
+        pipeline = [*pipeline, {'$project': projection}]
+    elif not any(stage.keys() & _SHAPING_STAGES for stage in pipeline):
+        warnings.warn(
+            "full-document fetch; pass a projection, e.g. {'_id': 0, 'field': 1}",
+            PerformanceWarning,
+            stacklevel=_caller_stacklevel()
+        )
+    options: dict = {'allowDiskUse': allow_disk_use}
+    if batch_size:
+        options['batchSize'] = batch_size
+    return get_collection(database, collection, DATETIME_CODEC_OPTIONS).aggregate(pipeline, **options)
 
 
 
-def count(database:str, collection:str, criteria=CRITERIA):
+@_cached_read
+@_wrap_mongo_errors
+def count(database:str, collection:str, criteria:dict=CRITERIA, hint:Optional[Union[str, list]]=None):
     """
     The function `count` connects to a MongoDB database, counts the number of documents in a specified
     collection based on given criteria, and returns the count.
@@ -184,23 +519,75 @@ def count(database:str, collection:str, criteria=CRITERIA):
     :param criteria: The `criteria` parameter in the `count` function is used to specify the conditions
     that documents must meet to be included in the count operation. It is typically a query document
     that filters the documents in the collection based on certain criteria. If no criteria is provided,
-    the function will count all documents in
+    the function will count all documents in. Without criteria the count is read from the collection
+    metadata (`estimated_document_count`) instead of scanning the collection; it may be off after an
+    unclean shutdown and ignores uncommitted transactions
+    :param hint: The `hint` parameter is the index MongoDB must use to count the documents matching
+    `criteria`, given by name or by keys, defaults to None (optional)
+    :type hint: str or list
     :return: The count of documents in the specified collection that match the given criteria is being
     returned by the `count` function.
     """
-    try:
-        db ,client = connect_to_mongodb(database)
-        data = db[collection].count(criteria)
-        # close_mongodb_connection(client)
-        return data
-    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
-        raise ValueError(f'Database operation failure {e}')
+    if not criteria:
+        return get_collection(database, collection).estimated_document_count()
+    if hint:
+        return get_collection(database, collection).count_documents(criteria, hint=hint)
+    return get_collection(database, collection).count_documents(criteria)
+
+
+@_cached_read
+@_wrap_mongo_errors
+def find_page(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA, sort:Optional[list]=SORT, skip:int=0, limit:int=0):
+    """
+    The function `find_page` returns a page of the documents matching `criteria` together with the total
+    number of matching documents, the two results a pager needs. They are computed by a single `$facet`
+    aggregation, so the criteria are evaluated once and one round-trip is made instead of a `finds` and
+    a `count`. The page and the total are returned in one BSON document, so the page must stay under the
+    16MB document limit.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to query
+    :type collection: str
+    :param projection: The fields to include or exclude from the page, it can't be `None` or empty
+    :type projection: dict
+    :param criteria: The conditions the documents must meet
+    :type criteria: dict
+    :param sort: The fields and directions to sort the page by, `None` to skip the sort
+    :type sort: list
+    :param skip: The number of documents to skip, defaults to 0 (optional)
+    :type skip: int
+    :param limit: The maximum number of documents in the page, 0 means no limit, defaults to 0 (optional)
+    :type limit: int
+    :return: A dict with the `data` key holding the documents of the page, with their datetimes
+    formatted as strings, and the `total` key holding the number of documents matching `criteria`.
+    """
+    _check_projection(projection)
+    if sort == SORT:
+        _auto_ensure_sort_index(database, collection)
+    page: list = []
+    if skip:
+        page.append({'$skip': skip})
+    if limit:
+        page.append({'$limit': limit})
+    page.append({'$project': projection})
+    # The sub-pipelines of `$facet` can't use indexes, the sort stays in front of it.
+    pipeline: list = [{'$match': criteria}]
+    if sort:
+        pipeline.append({'$sort': dict(sort)})
+    pipeline.append({'$facet': {'data': page, 'total': [{'$count': 'total'}]}})
+    result = next(get_collection(database, collection, DATETIME_CODEC_OPTIONS).aggregate(pipeline, allowDiskUse=True))
+    return {'data': result['data'], 'total': result['total'][0]['total'] if result['total'] else 0}
     
 
-def insert_many(database:str,collection:str, datas:list, datalist=False):
+@_wrap_mongo_errors
+def insert_many(database:str,collection:str, datas:list, datalist:bool=False):
     """
     The function `insert_many` inserts a list of data into a MongoDB collection, generates unique
-    identifiers, timestamps, and handles exceptions related to database operations.
+    identifiers, timestamps, and handles exceptions related to database operations. The incrementor IDs
+    of the whole list are reserved with a single round-trip, and the documents are sent as one unordered
+    bulk insert: the server does not stop at the first failing document, the failures are reported
+    together once the batch is done.
     
     :param database: The `database` parameter in the `insert_many` function is a string that represents
     the name of the MongoDB database where you want to insert data
@@ -218,34 +605,33 @@ def insert_many(database:str,collection:str, datas:list, datalist=False):
     MongoDB collection. If `datalist` is set to `True`, the function will return the list of records by
     calling the `, defaults to False (optional)
     :return: The function `insert_many` returns a list of record IDs that were inserted into the MongoDB
-    collection. If the `datalist` parameter is set to `True`, it also returns the result of the `finds`
-    function for the specified database and collection.
+    collection. If the `datalist` parameter is set to `True`, it returns copies of the inserted documents
+    with their datetimes formatted instead, no follow-up read is made.
     """
-    try:
-        db ,client = connect_to_mongodb(database)
-        datas_= []
-        records_ids = []
-        # f"{get_reference_key()}s" = []
-        # exec(f"{variable_name} = '{[]}'")
-        for data in datas :
-            date = datetime.datetime.now()
-            record_id = str(uuid.uuid4())
-            data['created_at'] = date
-            data['updated_at'] = date
-            data['id'] = next_record_identifier_value(database,collection)
-            data[get_reference_key()] = record_id
-            datas_.append[data]
-            records_ids.append(record_id)
-        db[collection].insert_many(datas_)
-        close_mongodb_connection(client)
-        if datalist:
-            return finds(database, collection)
-        return records_ids
-    except (ConnectionFailure, AutoReconnect, OperationFailure, DuplicateKeyError) as e:
-        raise ValueError(f'Database operation failure {e}')
-
-
-def delete_one(database:str, collection:str, criteria, datalist=False):
+    if not datas:
+        return []
+    datas_= []
+    records_ids = []
+    date = datetime.datetime.now(datetime.timezone.utc)
+    reference_key = get_reference_key()
+    identifiers = next_record_identifier_values(database,collection,len(datas))
+    for data, identifier in zip(datas, identifiers) :
+        record_id = uuid.uuid4().hex
+        data['created_at'] = date
+        data['updated_at'] = date
+        data['id'] = identifier
+        data[reference_key] = record_id
+        datas_.append(data)
+        records_ids.append(record_id)
+    get_collection(database, collection).insert_many(datas_, ordered=False)
+    _invalidate_reads(database, collection)
+    if datalist:
+        return [_format_timestamps(dict(data)) for data in datas_]
+    return records_ids
+
+
+@_wrap_mongo_errors
+def delete_one(database:str, collection:str, criteria:dict, datalist:bool=False, projection:dict=PROJECTION):
     """
     The function `delete_one` deletes a single document from a MongoDB collection based on specified
     criteria and returns True upon successful deletion.
@@ -262,28 +648,29 @@ def delete_one(database:str, collection:str, criteria, datalist=False):
     dictionary that contains the fields and values that the documents must match in order to be deleted.
     For example, if you want to
     :param datalist: The `datalist` parameter in the `delete_one` function is a boolean flag that
-    indicates whether the function should return the list of remaining documents in the collection after
-    deleting one document. If `datalist` is set to `True`, the function will return the list of
-    documents. If `datal, defaults to False (optional)
+    indicates whether the function should return the deleted document instead of `True`, defaults to
+    False (optional)
+    :param projection: The fields of the deleted document to return when `datalist` is `True`
+    :type projection: dict
     :return: The function `delete_one` will return `True` if the deletion operation is successful. If
-    the `datalist` parameter is set to `True`, it will also return the result of the `finds` function
-    for the specified database and collection.
+    the `datalist` parameter is set to `True`, it will return the deleted document instead, or `None`
+    if no document matched; it is fetched by the delete command itself (`find_one_and_delete`).
     """
-    try:
-        db ,client = connect_to_mongodb(database)
-        db[collection].delete_one(criteria)
-        close_mongodb_connection(client)
-        if datalist:
-            return finds(database, collection)
-        return True
-    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
-       raise ValueError(f'Database operation failure {e}')
+    if datalist:
+        _check_projection(projection)
+        data = get_collection(database, collection, DATETIME_CODEC_OPTIONS).find_one_and_delete(criteria, projection=projection)
+        _invalidate_reads(database, collection)
+        return data
+    get_collection(database, collection).delete_one(criteria)
+    _invalidate_reads(database, collection)
+    return True
    
 
-def delete_many(database, collection, criteria, datalist=True):
+@_wrap_mongo_errors
+def delete_many(database:str, collection:str, criteria:dict, datalist:bool=True, chunk_size:int=1000):
     """
     The function `delete_many` deletes multiple documents from a MongoDB collection based on specified
-    criteria and returns the remaining documents if `datalist` is True.
+    criteria and returns the number of deleted documents if `datalist` is True.
     
     :param database: The `database` parameter in the `delete_many` function refers to the name of the
     MongoDB database that you want to connect to and perform operations on. It is used to specify the
@@ -296,29 +683,39 @@ def delete_many(database, collection, criteria, datalist=True):
     database. It is typically a dictionary containing key-value pairs that represent the conditions for
     deletion. Only documents that match all the criteria specified in
     :param datalist: The `datalist` parameter in the `delete_many` function is a boolean flag that
-    determines whether the function should return the list of documents that remain in the collection
-    after the deletion operation is performed. If `datalist` is set to `True`, the function will return
-    the list of remaining documents, defaults to True (optional)
-    :return: If the `datalist` parameter is `True`, the function will return the result of the `finds`
-    function called with the `database` and `collection` parameters. If the `datalist` parameter is
-    `False`, the function will return `True`.
+    determines whether the function should return the number of deleted documents instead of `True`,
+    defaults to True (optional)
+    :param chunk_size: When a field of `criteria` is only matched with an `$in` list longer than
+    `chunk_size`, e.g. `{'id': {'$in': ids}}`, the list is split into chunks of `chunk_size` values
+    sent as one unordered bulk of deletes, so huge lists never hit the command size limit, defaults to
+    1000 (optional)
+    :type chunk_size: int
+    :return: If the `datalist` parameter is `True`, the function will return the `deleted_count` of the
+    operation, the collection is not read back. If the `datalist` parameter is `False`, the function
+    will return `True`.
     """
-    try:
-        db ,client = connect_to_mongodb(database)
-        db[collection].delete_many(criteria)
-        close_mongodb_connection(client)
-        if datalist:
-            return finds(database, collection)
-        else:
-            True
-    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
-       raise ValueError(f'Database operation failure {e}')
+    field = _chunkable_in_field(criteria, chunk_size)
+    if field is None:
+        result = get_collection(database, collection).delete_many(criteria)
+    else:
+        values = criteria[field]['$in']
+        operations = [
+            DeleteMany({**criteria, field: {'$in': values[start:start + chunk_size]}})
+            for start in range(0, len(values), chunk_size)
+        ]
+        result = get_collection(database, collection).bulk_write(operations, ordered=False)
+    _invalidate_reads(database, collection)
+    if datalist:
+        return result.deleted_count
+    else:
+        return True
    
 
-def update_one(database,collection, criteria,update_operation:str, data:dict, datalist=True):
+@_wrap_mongo_errors
+def update_one(database:str,collection:str, criteria:dict,update_operation:str, data:dict, datalist:bool=True, projection:dict=PROJECTION):
     """
     The function `update_one` updates a document in a MongoDB collection based on specified criteria and
-    returns the updated data or a list of documents.
+    returns the number of modified documents or `True`.
     
     :param database: The `database` parameter in the `update_one` function refers to the name of the
     database in which the collection is located. It is used to specify the database where the update
@@ -340,23 +737,138 @@ def update_one(database,collection, criteria,update_operation:str, data:dict, da
     set for those fields
     :type data: dict
     :param datalist: The `datalist` parameter in the `update_one` function is a boolean flag that
-    determines whether the function should return a list of data after performing the update operation.
-    If `datalist` is set to `True`, the function will return the updated list of data from the specified
-    `collection`, defaults to True (optional)
-    :return: If `datalist` is `True`, the function will return the result of the `finds` function with
-    the specified `database` and `collection`. If `datalist` is `False`, it will return `True` after
-    closing the MongoDB connection.
-    """
-    db = client[database]
-    try:
-        data['updated_at'] = datetime.datetime.now()
-        db ,client = connect_to_mongodb(database)
-        #'$pull', '$push','$set'
-        db[collection].update_one(criteria, {update_operation: data})
-        if datalist:
-            return finds(database, collection)
+    determines whether the function should return the updated document instead of `True`, defaults to
+    True (optional)
+    :param projection: The fields of the updated document to return when `datalist` is `True`
+    :type projection: dict
+    :return: If `datalist` is `True`, the function will return the document as it is after the update,
+    or `None` if no document matched; it is fetched by the update command itself
+    (`find_one_and_update`). If `datalist` is `False`, it will return `True`.
+    """
+    #'$pull', '$push','$set'
+    update = _stamped_update(update_operation, data)
+    if datalist:
+        _check_projection(projection)
+        document = get_collection(database, collection, DATETIME_CODEC_OPTIONS).find_one_and_update(
+            criteria,
+            update,
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        _invalidate_reads(database, collection)
+        return document
+    get_collection(database, collection).update_one(criteria, update)
+    _invalidate_reads(database, collection)
+    return True
+
+
+class BulkWriter:
+    """
+    The class `BulkWriter` queues `insert_one`, `update_one` and `delete_one` operations on a collection
+    and sends them with `bulk_write`, so a loop of N writes costs one round-trip per `flush_every`
+    operations instead of N. Documents are stamped like `insert_one` does; the incrementor IDs of the
+    queued inserts are reserved with a single round-trip when the queue is flushed.
+    
+    The queue is flushed when it reaches `flush_every` operations and when the `with` block exits
+    without an exception, e.g.
+    
+        with BulkWriter('my_database', 'my_collection') as writer:
+            for item in items:
+                writer.insert_one(item)
+    
+    :param database: The name of the MongoDB database to write to
+    :type database: str
+    :param collection: The name of the collection to write to
+    :type collection: str
+    :param flush_every: The number of queued operations that triggers a flush, defaults to 1000
+    (optional)
+    :type flush_every: int
+    :param ordered: Whether the server applies the operations in order and stops at the first error,
+    defaults to True (optional). Pass `False` for faster inserts when the operations don't depend on
+    each other
+    :type ordered: bool
+    """
+
+    def __init__(self, database:str, collection:str, flush_every:int=1000, ordered:bool=True):
+        self.database = database
+        self.collection = collection
+        self.flush_every = flush_every
+        self.ordered = ordered
+        self._operations: list = []
+        self._inserted: list = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
         else:
-            close_mongodb_connection(client)
-            return True
-    except (ConnectionFailure, AutoReconnect, OperationFailure,DuplicateKeyError) as e:
-       raise ValueError(f'Database operation failure {e}')
+            self._operations.clear()
+            self._inserted.clear()
+
+    def insert_one(self, data:dict):
+        """
+        The method `insert_one` queues the insertion of `data` after stamping its timestamps and
+        reference key, the `id` is set when the queue is flushed.
+        
+        :param data: The document to insert
+        :type data: dict
+        :return: The reference key of the document.
+        """
+        date = datetime.datetime.now(datetime.timezone.utc)
+        data['created_at'] = date
+        data['updated_at'] = date
+        record_id = uuid.uuid4().hex
+        data[get_reference_key()] = record_id
+        self._inserted.append(data)
+        self._queue(InsertOne(data))
+        return record_id
+
+    def update_one(self, criteria:dict, update_operation:str, data:dict):
+        """
+        The method `update_one` queues the `update_operation` (e.g. '$set') of the first document
+        matching `criteria` with `data`, the server stamps its `updated_at` (`$currentDate`).
+        
+        :param criteria: The conditions the document must meet
+        :type criteria: dict
+        :param update_operation: The MongoDB update operator, e.g. '$set', '$push' or '$pull'
+        :type update_operation: str
+        :param data: The operand of the update operator
+        :type data: dict
+        """
+        self._queue(UpdateOne(criteria, _stamped_update(update_operation, data)))
+
+    def delete_one(self, criteria:dict):
+        """
+        The method `delete_one` queues the deletion of the first document matching `criteria`.
+        
+        :param criteria: The conditions the document must meet
+        :type criteria: dict
+        """
+        self._queue(DeleteOne(criteria))
+
+    def _queue(self, operation):
+        self._operations.append(operation)
+        if len(self._operations) >= self.flush_every:
+            self.flush()
+
+    @_wrap_mongo_errors
+    def flush(self):
+        """
+        The method `flush` sends the queued operations with a single `bulk_write`.
+        
+        :return: The `BulkWriteResult` of the operations, or `None` if nothing was queued.
+        """
+        if not self._operations:
+            return None
+        operations, self._operations = self._operations, []
+        inserted, self._inserted = self._inserted, []
+        try:
+            if inserted:
+                identifiers = next_record_identifier_values(self.database, self.collection, len(inserted))
+                for data, identifier in zip(inserted, identifiers):
+                    data['id'] = identifier
+            return get_collection(self.database, self.collection).bulk_write(operations, ordered=self.ordered)
+        finally:
+            _invalidate_reads(self.database, self.collection)
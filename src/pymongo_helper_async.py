@@ -0,0 +1,382 @@
+"""
+Asyncio counterparts of the `pymongo_helper` operations, on `AsyncMongoClient` (pymongo>=4.9) or Motor.
+They take the same parameters and return the same results, except that:
+
+- their results are never served from the read cache, their writes still invalidate it;
+- `aggregate` doesn't emit the `PerformanceWarning` of full-document fetches;
+- `MONGOPH_ID_BLOCK_SIZE` is ignored, `insert_one` makes one incrementor round-trip per document
+  (`insert_many` still reserves all its IDs at once);
+- `MONGOPH_ENSURE_SORT_INDEX` is ignored, call `db_helper.ensure_sort_index` at startup instead;
+- `finds_json`, `find_page` and `BulkWriter` have no async counterpart.
+"""
+import datetime
+import inspect
+import uuid
+from typing import Optional, Union
+from pymongo import DeleteMany, ReturnDocument
+from pymongo.errors import ConnectionFailure, OperationFailure,AutoReconnect,DuplicateKeyError
+from .db_helper import get_reference_key
+from .db_helper_async import anext_record_identifier_value,anext_record_identifier_values,get_async_collection
+from .pymongo_helper import CRITERIA,PROJECTION,SORT,_check_projection,_chunkable_in_field,_format_timestamps,_invalidate_reads,_output_collection,_stamped_update
+from .utils import DATETIME_CODEC_OPTIONS, RAW_CODEC_OPTIONS
+
+async def find_one(database:str,collection:str, criteria:dict=CRITERIA, projection:dict=PROJECTION, raw:bool=False):
+    """
+    The function `find_one` is the asyncio counterpart of `pymongo_helper.find_one`: it retrieves one
+    document of a collection matching `criteria` and formats its datetimes.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to query
+    :type collection: str
+    :param criteria: The conditions the document must meet
+    :type criteria: dict
+    :param projection: The fields to include or exclude from the result
+    :type projection: dict
+    :param raw: Whether to return the document as an undecoded `RawBSONDocument`, defaults to False
+    (optional)
+    :type raw: bool
+    :return: The formatted document, or `None` if no document matches.
+    """
+    try:
+        _check_projection(projection)
+        codec_options = RAW_CODEC_OPTIONS if raw else DATETIME_CODEC_OPTIONS
+        return await get_async_collection(database, collection, codec_options).find_one(criteria, projection)
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+
+async def finds(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA,sort:Optional[list]=SORT, limit:int=0,pager:Optional[dict]=None, batch_size:int=0, raw:bool=False, hint:Optional[Union[str, list]]=None, *, skip:int=0):
+    """
+    The function `finds` is the asyncio counterpart of `pymongo_helper.finds`: it retrieves the
+    documents of a collection matching `criteria`, sorted and paginated.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to query
+    :type collection: str
+    :param projection: The fields to include or exclude from the results
+    :type projection: dict
+    :param criteria: The conditions the documents must meet
+    :type criteria: dict
+    :param sort: The fields and directions to sort the results by, `None` to skip the sort
+    :type sort: list
+    :param limit: The maximum number of documents to return, 0 means no limit, defaults to 0 (optional)
+    :param pager: A dict with the `skip` and `limit` keys used for pagination
+    :type pager: dict
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :param raw: Whether to return undecoded `RawBSONDocument`s, defaults to False (optional)
+    :type raw: bool
+    :param hint: The index MongoDB must use, by name or by keys, defaults to None (optional)
+    :param skip: The number of documents to skip, `pager` overrides it, defaults to 0 (optional)
+    :type skip: int
+    :return: The list of formatted documents.
+    """
+    cursor = finds_iter(database, collection, projection, criteria, sort, limit, pager, batch_size, raw, hint, skip=skip)
+    try:
+        return [element async for element in cursor]
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+
+def finds_iter(database:str, collection:str, projection:dict=PROJECTION, criteria:dict=CRITERIA,sort:Optional[list]=SORT, limit:int=0,pager:Optional[dict]=None, batch_size:int=0, raw:bool=False, hint:Optional[Union[str, list]]=None, *, skip:int=0):
+    """
+    The function `finds_iter` is the asyncio counterpart of `pymongo_helper.finds_iter`: it returns the
+    async cursor over the matching documents, to be consumed with `async for` one batch at a time. It
+    must be called from a coroutine. The PyMongo errors raised while iterating the cursor are not turned
+    into `ValueError`.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to query
+    :type collection: str
+    :param projection: The fields to include or exclude from the results
+    :type projection: dict
+    :param criteria: The conditions the documents must meet
+    :type criteria: dict
+    :param sort: The fields and directions to sort the results by, `None` to skip the sort
+    :type sort: list
+    :param limit: The maximum number of documents to return, 0 means no limit, defaults to 0 (optional)
+    :param pager: A dict with the `skip` and `limit` keys used for pagination
+    :type pager: dict
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :param raw: Whether to return undecoded `RawBSONDocument`s, defaults to False (optional)
+    :type raw: bool
+    :param hint: The index MongoDB must use, by name or by keys, defaults to None (optional)
+    :param skip: The number of documents to skip, `pager` overrides it, defaults to 0 (optional)
+    :type skip: int
+    :return: The async cursor over the formatted documents.
+    """
+    _check_projection(projection)
+    if pager :
+        try:
+            skip, limit = pager['skip'], pager['limit']
+        except KeyError:
+            raise ValueError('Pager should have skip and limit keys') from None
+    codec_options = RAW_CODEC_OPTIONS if raw else DATETIME_CODEC_OPTIONS
+    cursor = get_async_collection(database, collection, codec_options).find(criteria, projection, batch_size=batch_size)
+    if hint:
+        cursor = cursor.hint(hint)
+    if sort:
+        cursor = cursor.sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
+    return cursor.limit(limit)
+
+async def insert_one(database:str, collection:str, data, datalist=True):
+    """
+    The function `insert_one` is the asyncio counterpart of `pymongo_helper.insert_one`: it stamps the
+    document with its timestamps, incrementor ID and reference key, then inserts it.
+    
+    :param database: The name of the MongoDB database to insert into
+    :type database: str
+    :param collection: The name of the collection to insert into
+    :type collection: str
+    :param data: The document to insert
+    :param datalist: Whether to return the inserted document instead of its reference key, defaults to
+    True (optional)
+    :return: A copy of the inserted document with its datetimes formatted if `datalist` is `True`, else
+    the reference key of the document.
+    """
+    try:
+        date = datetime.datetime.now(datetime.timezone.utc)
+        data['created_at'] = date
+        data['updated_at'] = date
+        data['id'] = await anext_record_identifier_value(database,collection)
+        record_id = uuid.uuid4().hex
+        data[get_reference_key()] = record_id
+        await get_async_collection(database, collection).insert_one(data)
+        if datalist:
+            return _format_timestamps(dict(data))
+        return record_id
+    except (ConnectionFailure, AutoReconnect, OperationFailure,DuplicateKeyError) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+    finally:
+        _invalidate_reads(database, collection)
+
+async def aggregate(database:str,collection:str, pipeline:list, projection:Optional[dict]=None, allow_disk_use:bool=True, batch_size:int=0):
+    """
+    The function `aggregate` is the asyncio counterpart of `pymongo_helper.aggregate`: it runs an
+    aggregation pipeline on a collection and formats the resulting documents.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to aggregate
+    :type collection: str
+    :param pipeline: The aggregation stages
+    :type pipeline: list
+    :param projection: Appended to the pipeline as a final `$project` stage when given, defaults to None
+    (optional)
+    :type projection: dict
+    :param allow_disk_use: Whether the stages may spill to temporary files, defaults to True (optional)
+    :type allow_disk_use: bool
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :return: The list of formatted documents. The cached reads of the collection written by a final
+    `$out` or `$merge` stage are dropped.
+    """
+    output = _output_collection(database, pipeline)
+    try:
+        cursor = await aggregate_iter(database, collection, pipeline, projection, allow_disk_use, batch_size)
+        return [data async for data in cursor]
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+    finally:
+        if output is not None:
+            _invalidate_reads(*output)
+
+async def aggregate_iter(database:str,collection:str, pipeline:list, projection:Optional[dict]=None, allow_disk_use:bool=True, batch_size:int=0):
+    """
+    The function `aggregate_iter` is the asyncio counterpart of `pymongo_helper.aggregate_iter`: it
+    returns the async cursor over the resulting documents, to be consumed with `async for`. The PyMongo
+    errors raised while iterating the cursor are not turned into `ValueError`.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to aggregate
+    :type collection: str
+    :param pipeline: The aggregation stages, `$match` first
+    :type pipeline: list
+    :param projection: Appended to the pipeline as a final `$project` stage when given, defaults to None
+    (optional)
+    :type projection: dict
+    :param allow_disk_use: Whether the stages may spill to temporary files, defaults to True (optional)
+    :type allow_disk_use: bool
+    :param batch_size: The number of documents fetched per round-trip, 0 lets the server decide,
+    defaults to 0 (optional)
+    :type batch_size: int
+    :return: The async cursor over the formatted documents.
+    """
+    if projection:
+        pipeline = [*pipeline, {'$project': projection}]
+    options: dict = {'allowDiskUse': allow_disk_use}
+    if batch_size:
+        options['batchSize'] = batch_size
+    try:
+        cursor = get_async_collection(database, collection, DATETIME_CODEC_OPTIONS).aggregate(pipeline, **options)
+        if inspect.isawaitable(cursor):
+            # AsyncMongoClient returns the cursor from a coroutine, Motor returns it directly.
+            cursor = await cursor
+        return cursor
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+
+async def count(database:str, collection:str, criteria:dict=CRITERIA, hint:Optional[Union[str, list]]=None):
+    """
+    The function `count` is the asyncio counterpart of `pymongo_helper.count`: it counts the documents
+    of a collection matching `criteria`.
+    
+    :param database: The name of the MongoDB database to query
+    :type database: str
+    :param collection: The name of the collection to count
+    :type collection: str
+    :param criteria: The conditions the documents must meet, without criteria the count is read from
+    the collection metadata (`estimated_document_count`) instead of scanning the collection
+    :param hint: The index MongoDB must use to count the documents matching `criteria`, by name or by
+    keys, defaults to None (optional)
+    :type hint: str or list
+    :return: The number of matching documents.
+    """
+    try:
+        if not criteria:
+            return await get_async_collection(database, collection).estimated_document_count()
+        if hint:
+            return await get_async_collection(database, collection).count_documents(criteria, hint=hint)
+        return await get_async_collection(database, collection).count_documents(criteria)
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+
+async def insert_many(database:str,collection:str, datas:list, datalist=False):
+    """
+    The function `insert_many` is the asyncio counterpart of `pymongo_helper.insert_many`: it stamps
+    every document like `insert_one` does and inserts them with a single command.
+    
+    :param database: The name of the MongoDB database to insert into
+    :type database: str
+    :param collection: The name of the collection to insert into
+    :type collection: str
+    :param datas: The documents to insert
+    :type datas: list
+    :param datalist: Whether to return the inserted documents instead of their reference keys, defaults
+    to False (optional)
+    :return: Copies of the inserted documents with their datetimes formatted if `datalist` is `True`,
+    else the list of reference keys.
+    """
+    if not datas:
+        return []
+    try:
+        records_ids = []
+        date = datetime.datetime.now(datetime.timezone.utc)
+        reference_key = get_reference_key()
+        identifiers = await anext_record_identifier_values(database,collection,len(datas))
+        for data, identifier in zip(datas, identifiers) :
+            record_id = uuid.uuid4().hex
+            data['created_at'] = date
+            data['updated_at'] = date
+            data['id'] = identifier
+            data[reference_key] = record_id
+            records_ids.append(record_id)
+        await get_async_collection(database, collection).insert_many(datas, ordered=False)
+        if datalist:
+            return [_format_timestamps(dict(data)) for data in datas]
+        return records_ids
+    except (ConnectionFailure, AutoReconnect, OperationFailure, DuplicateKeyError) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+    finally:
+        _invalidate_reads(database, collection)
+
+async def delete_one(database:str, collection:str, criteria, datalist=False, projection:dict=PROJECTION):
+    """
+    The function `delete_one` is the asyncio counterpart of `pymongo_helper.delete_one`: it deletes
+    the first document matching `criteria`.
+    
+    :param database: The name of the MongoDB database to delete from
+    :type database: str
+    :param collection: The name of the collection to delete from
+    :type collection: str
+    :param criteria: The conditions the document must meet
+    :param datalist: Whether to return the deleted document, defaults to False (optional)
+    :param projection: The fields of the deleted document to return when `datalist` is `True`
+    :type projection: dict
+    :return: The deleted document (`find_one_and_delete`) if `datalist` is `True`, else `True`.
+    """
+    try:
+        if datalist:
+            _check_projection(projection)
+            return await get_async_collection(database, collection, DATETIME_CODEC_OPTIONS).find_one_and_delete(criteria, projection=projection)
+        await get_async_collection(database, collection).delete_one(criteria)
+        return True
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+    finally:
+        _invalidate_reads(database, collection)
+
+async def delete_many(database, collection, criteria, datalist=True, chunk_size:int=1000):
+    """
+    The function `delete_many` is the asyncio counterpart of `pymongo_helper.delete_many`: it deletes
+    every document matching `criteria`.
+    
+    :param database: The name of the MongoDB database to delete from
+    :param collection: The name of the collection to delete from
+    :param criteria: The conditions the documents must meet
+    :param datalist: Whether to return the number of deleted documents, defaults to True (optional)
+    :param chunk_size: The maximum number of values of an `$in` list sent per delete, see
+    `pymongo_helper.delete_many`, defaults to 1000 (optional)
+    :type chunk_size: int
+    :return: The `deleted_count` of the operation if `datalist` is `True`, else `True`.
+    """
+    try:
+        field = _chunkable_in_field(criteria, chunk_size)
+        if field is None:
+            result = await get_async_collection(database, collection).delete_many(criteria)
+        else:
+            values = criteria[field]['$in']
+            operations = [
+                DeleteMany({**criteria, field: {'$in': values[start:start + chunk_size]}})
+                for start in range(0, len(values), chunk_size)
+            ]
+            result = await get_async_collection(database, collection).bulk_write(operations, ordered=False)
+        if datalist:
+            return result.deleted_count
+        return True
+    except (ConnectionFailure, AutoReconnect, OperationFailure) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+    finally:
+        _invalidate_reads(database, collection)
+
+async def update_one(database,collection, criteria,update_operation:str, data:dict, datalist=True, projection:dict=PROJECTION):
+    """
+    The function `update_one` is the asyncio counterpart of `pymongo_helper.update_one`: it applies
+    `update_operation` (e.g. '$set') with `data` to the first document matching `criteria`.
+    
+    :param database: The name of the MongoDB database to update
+    :param collection: The name of the collection to update
+    :param criteria: The conditions the document must meet
+    :param update_operation: The MongoDB update operator, e.g. '$set', '$push' or '$pull'
+    :type update_operation: str
+    :param data: The operand of the update operator
+    :type data: dict
+    :param datalist: Whether to return the updated document, defaults to True (optional)
+    :param projection: The fields of the updated document to return when `datalist` is `True`
+    :type projection: dict
+    :return: The document after the update (`find_one_and_update`) if `datalist` is `True`, else `True`.
+    """
+    try:
+        update = _stamped_update(update_operation, data)
+        if datalist:
+            _check_projection(projection)
+            return await get_async_collection(database, collection, DATETIME_CODEC_OPTIONS).find_one_and_update(
+                criteria,
+                update,
+                projection=projection,
+                return_document=ReturnDocument.AFTER
+            )
+        await get_async_collection(database, collection).update_one(criteria, update)
+        return True
+    except (ConnectionFailure, AutoReconnect, OperationFailure,DuplicateKeyError) as e:
+        raise ValueError(f'Database operation failure {e}') from e
+    finally:
+        _invalidate_reads(database, collection)
@@ -1,9 +1,47 @@
 
 
+import base64
 import datetime
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+from bson.raw_bson import RawBSONDocument
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
-def datetime_formater(iters):
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_naive_datetime(value):
+    return value.isoformat(timespec='seconds')
+
+
+def format_datetime(value):
+    """
+    The function `format_datetime` formats a datetime in the `DATETIME_FORMAT` format with
+    `isoformat`, which is implemented in C and, unlike `strftime`, doesn't parse a format string on each
+    call. The timezone of an aware datetime is dropped, as `strftime` would. The strings of the last
+    4096 datetimes are cached, so the timestamps repeated across a result set, e.g. those of documents
+    inserted by the same `insert_many`, are formatted once and share the same string.
+    
+    :param value: The datetime to format
+    :type value: datetime.datetime
+    :return: The formatted datetime, e.g. '2024-05-01T08:30:15'.
+    """
+    # Aware datetimes compare equal across timezones, they are made naive before the cache lookup.
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return _format_naive_datetime(value)
+
+
+def datetime_formater(iters, _datetime=datetime.datetime):
     """
     The function `datetime_formater` iterates through a dictionary and converts any datetime values to a
     specific string format.
@@ -16,7 +54,164 @@ def datetime_formater(iters):
     value is formatted as a string in the format "%Y-%m-%dT%H:%M:%S". The function then returns the
     modified dictionary `iters` with datetime values formatted as strings
     """
-    for key in iters:
-        if isinstance(iters[key], datetime.datetime):
-            iters[key] = iters[key].strftime("%Y-%m-%dT%H:%M:%S")
-    return iters
\ No newline at end of file
+    for key, value in iters.items():
+        if type(value) is _datetime:
+            iters[key] = format_datetime(value)
+    return iters
+
+
+def make_formatter(fields):
+    """
+    The function `make_formatter` returns a `datetime_formater` specialized for documents whose datetime
+    fields are known: only `fields` are looked up, instead of type-checking every value.
+    
+    :param fields: The names of the datetime fields to format
+    :type fields: tuple
+    :return: A function formatting those fields of a dict in place and returning the dict.
+    """
+    fields = tuple(fields)
+
+    def formatter(iters, _datetime=datetime.datetime):
+        for key in fields:
+            value = iters.get(key)
+            if type(value) is _datetime:
+                iters[key] = format_datetime(value)
+        return iters
+    return formatter
+
+
+class DatetimeStringDecoder(TypeDecoder):
+    """
+    The class `DatetimeStringDecoder` makes the BSON decoder return datetimes as strings in the
+    `datetime_formater` format, so documents read with `DATETIME_CODEC_OPTIONS` need no Python-side
+    formatting pass. Unlike `datetime_formater`, nested datetimes are formatted too.
+    """
+    bson_type = datetime.datetime
+
+    def transform_bson(self, value):
+        return format_datetime(value)
+
+
+DATETIME_CODEC_OPTIONS: CodecOptions = CodecOptions(
+    tz_aware=False,
+    unicode_decode_error_handler='strict',
+    type_registry=TypeRegistry([DatetimeStringDecoder()]),
+)
+
+# Documents read with these options keep their BSON bytes (`.raw`), fields are only decoded when
+# accessed. Meant for results forwarded as is, e.g. with `json_dumps`.
+RAW_CODEC_OPTIONS: CodecOptions = CodecOptions(
+    document_class=RawBSONDocument,
+    tz_aware=False,
+    unicode_decode_error_handler='strict',
+)
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return format_datetime(value)
+    if isinstance(value, RawBSONDocument):
+        return dict(value)
+    if isinstance(value, bytes):
+        # `bson.Binary` included.
+        return base64.b64encode(value).decode('ascii')
+    return str(value)
+
+
+def json_dumps(documents) -> bytes:
+    """
+    The function `json_dumps` serializes documents to JSON bytes, ready to be sent in an HTTP response.
+    It uses `orjson` when it is installed (`pip install pymongo-helper[json]`) and the standard `json`
+    module otherwise, with the same output. Datetimes are written in the `datetime_formater` format,
+    timezone dropped, bytes and `Binary` values in base64 and the other values JSON has no type for,
+    such as `ObjectId` or `Decimal128`, as their string. `RawBSONDocument`s (see
+    `RAW_CODEC_OPTIONS`) are decoded one level at a time as the serializer reaches them.
+    
+    :param documents: The document or list of documents to serialize
+    :return: The UTF-8 encoded JSON.
+    """
+    if orjson is not None:
+        # Datetimes are passed to `_json_default`, so both serializers format them the same way.
+        return orjson.dumps(documents, default=_json_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(documents, default=_json_default, separators=(',', ':')).encode()
+
+
+class TTLCache:
+    """
+    The class `TTLCache` is a small thread-safe mapping whose entries expire `ttl` seconds after they
+    were stored. When `maxsize` entries are held, the least recently stored one is evicted first.
+    
+    :param maxsize: The maximum number of entries kept in the cache, defaults to 1024 (optional)
+    :param ttl: The number of seconds an entry stays valid, defaults to 30 (optional)
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def evict(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def reset(self):
+        # Only for a child process after `os.fork()`: the inherited lock may be held by a parent thread
+        # that doesn't exist in the child, so a new lock is made instead of acquiring it.
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+
+def ttl_cache(maxsize=1024, ttl=30):
+    """
+    The function `ttl_cache` is a decorator memoizing a function on its positional arguments for `ttl`
+    seconds. The underlying `TTLCache` is exposed as the `cache` attribute of the decorated function so
+    callers can invalidate entries, e.g. `function.cache.pop(args)`.
+    
+    :param maxsize: The maximum number of results kept, defaults to 1024 (optional)
+    :param ttl: The number of seconds a result stays valid, defaults to 30 (optional)
+    :return: The decorator wrapping the function.
+    """
+    def decorator(function):
+        cache = TTLCache(maxsize, ttl)
+        missing = object()
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            value = cache.get(args, missing)
+            if value is missing:
+                value = function(*args)
+                cache.set(args, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -0,0 +1,208 @@
+import os
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from pymongo import ASCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure
+from src import db_helper
+from src.utils import DATETIME_CODEC_OPTIONS
+from src.db_helper import (
+    add_collection,
+    bulk_ensure_indexes,
+    bulk_next_record_identifier_values,
+    check_index_on_collection,
+    collection_exist,
+    connect_to_mongodb,
+    create_index_on_collection,
+    ensure_collection,
+    ensure_sort_index,
+    next_record_identifier_value,
+    next_record_identifier_values,
+)
+
+def test_next_record_identifier_value_connection_error():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_get_collection.side_effect = ValueError('Failed to connect to MongoDB')
+        with pytest.raises(ValueError, match='Failed to connect'):
+            next_record_identifier_value('my_database', 'my_collection')
+
+def test_collection_exist_filters_by_name():
+    with patch('src.db_helper.connect_to_mongodb') as mock_connect:
+        db = MagicMock()
+        mock_connect.return_value = (db, None)
+        db.list_collection_names.return_value = ['my_collection']
+        assert collection_exist('my_database', 'my_collection') is True
+        db.list_collection_names.assert_called_once_with(filter={'name': 'my_collection'})
+
+def test_check_index_on_collection_caches_index_names():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        collection = mock_get_collection.return_value
+        collection.list_indexes.return_value = [{'name': '_id_'}, {'name': 'my_collection_name'}]
+        assert check_index_on_collection('cached_database', 'my_collection', 'name') is True
+        assert check_index_on_collection('cached_database', 'my_collection', 'name') is True
+        assert collection.list_indexes.call_count == 1
+
+def test_next_record_identifier_values_reserves_a_range():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.find_one_and_update.return_value = {'tally': 10}
+        assert next_record_identifier_values('my_database', 'my_collection', 5) == range(6, 11)
+        update = mock_get_collection.return_value.find_one_and_update.call_args[0][1]
+        assert update == {'$inc': {'tally': 5}}
+
+def test_next_record_identifier_value_upserts_incrementor():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.find_one_and_update.return_value = {'tally': 1}
+        assert next_record_identifier_value('my_database', 'new_collection') == 1
+        assert mock_get_collection.return_value.find_one_and_update.call_args[1]['upsert'] is True
+        mock_get_collection.return_value.insert_one.assert_not_called()
+
+def test_add_collection_ignores_existing_collection():
+    with patch('src.db_helper.connect_to_mongodb') as mock_connect:
+        db = MagicMock()
+        mock_connect.return_value = (db, None)
+        db.create_collection.side_effect = CollectionInvalid('collection my_collection already exists')
+        assert add_collection('my_database', 'my_collection') is True
+
+def test_add_collection_sends_a_single_create():
+    with patch('src.db_helper.connect_to_mongodb') as mock_connect:
+        db = MagicMock()
+        mock_connect.return_value = (db, None)
+        db.create_collection.side_effect = OperationFailure('Collection already exists', code=48)
+        assert add_collection('my_database', 'my_collection') is True
+        db.create_collection.assert_called_once_with('my_collection', check_exists=False)
+        db.create_collection.side_effect = OperationFailure('not authorized', code=13)
+        with pytest.raises(ValueError, match='not authorized'):
+            add_collection('my_database', 'my_collection')
+
+def test_ensure_collection_creates_indexes_in_one_command():
+    with patch('src.db_helper.add_collection') as mock_add_collection, \
+            patch('src.db_helper.get_collection') as mock_get_collection:
+        assert ensure_collection('my_database', 'my_collection', ['name']) is True
+        mock_add_collection.assert_called_once_with('my_database', 'my_collection')
+        index_models = mock_get_collection.return_value.create_indexes.call_args[0][0]
+        assert [model.document['name'] for model in index_models] == ['my_collection_name']
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork')
+def test_child_process_gets_its_own_client(monkeypatch):
+    monkeypatch.setenv('MONGOPH_MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017')
+    _, parent_client = connect_to_mongodb('my_database')
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        _, child_client = connect_to_mongodb('my_database')
+        os.write(write_end, b'1' if child_client is not parent_client else b'0')
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 1) == b'1'
+
+def test_bulk_ensure_indexes_sends_one_command_per_collection():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        assert bulk_ensure_indexes('my_database', {'users': ['name', 'email'], 'posts': []}) is True
+        mock_get_collection.assert_called_once_with('my_database', 'users')
+        assert mock_get_collection.return_value.create_indexes.call_count == 1
+
+def test_check_index_on_collection_error_message_includes_cause():
+    with patch('src.db_helper._index_names') as mock_index_names:
+        mock_index_names.side_effect = OperationFailure('not authorized')
+        with pytest.raises(ValueError, match='not authorized'):
+            check_index_on_collection('my_database', 'my_collection', 'name')
+
+def test_create_index_on_collection_defaults_to_ascending():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        assert create_index_on_collection('my_database', 'my_collection', 'name') is True
+        mock_get_collection.return_value.create_index.assert_called_once_with(
+            [('name', ASCENDING)], name='my_collection_name'
+        )
+
+def test_create_index_on_collection_keeps_existing_index_with_the_same_name():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_create_index = mock_get_collection.return_value.create_index
+        mock_create_index.side_effect = OperationFailure('An existing index has the same name', code=86)
+        mock_get_collection.return_value.list_indexes.return_value = [
+            {'name': 'my_collection_name', 'key': {'name': 1}},
+        ]
+        assert create_index_on_collection('my_database', 'my_collection', 'name') is True
+        mock_create_index.side_effect = OperationFailure('not authorized', code=13)
+        with pytest.raises(ValueError, match='not authorized'):
+            create_index_on_collection('my_database', 'my_collection', 'name')
+
+def test_create_index_on_collection_reports_a_conflicting_index(caplog):
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.create_index.side_effect = OperationFailure('An existing index has the same name', code=86)
+        mock_get_collection.return_value.list_indexes.return_value = [
+            {'name': 'my_collection_name', 'key': {'_fts': 'text', '_ftsx': 1}, 'weights': {'name': 1}},
+        ]
+        assert create_index_on_collection('my_database', 'my_collection', 'name') is False
+        assert 'my_collection_name' in caplog.text
+        assert create_index_on_collection('my_database', 'my_collection', 'name', index_type='text') is True
+
+def test_create_index_on_collection_unknown_type():
+    with pytest.raises(ValueError, match='Unknown index type'):
+        create_index_on_collection('my_database', 'my_collection', 'name', index_type='btree')
+
+def test_ensure_sort_index_accepts_existing_index_and_runs_once():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_create_index = mock_get_collection.return_value.create_index
+        mock_create_index.side_effect = OperationFailure('Index already exists with a different name', code=85)
+        mock_get_collection.return_value.list_indexes.return_value = [{'name': 'by_date', 'key': {'created_at': -1}}]
+        assert ensure_sort_index('my_database', 'sorted_collection') is True
+        assert ensure_sort_index('my_database', 'sorted_collection') is True
+        mock_create_index.assert_called_once_with([('created_at', -1)])
+
+def test_client_options_offer_installed_compressors():
+    with patch.dict(os.environ), patch('importlib.util.find_spec', side_effect=lambda name: None if name == 'snappy' else object()):
+        os.environ.pop('MONGOPH_COMPRESSORS', None)
+        assert db_helper._client_options()['compressors'] == 'zstd,zlib'
+        os.environ['MONGOPH_COMPRESSORS'] = ''
+        assert 'compressors' not in db_helper._client_options()
+
+def test_get_collection_caches_codec_specific_collections(monkeypatch):
+    monkeypatch.setenv('MONGOPH_MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017')
+    collection = db_helper.get_collection('my_database', 'my_collection', DATETIME_CODEC_OPTIONS)
+    assert collection.codec_options is DATETIME_CODEC_OPTIONS
+    assert db_helper.get_collection('my_database', 'my_collection', DATETIME_CODEC_OPTIONS) is collection
+    assert db_helper.get_collection('my_database', 'my_collection') is not collection
+
+def test_ensure_sort_index_reports_a_conflicting_index():
+    with patch('src.db_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.create_index.side_effect = OperationFailure('An existing index has the same name', code=86)
+        mock_get_collection.return_value.list_indexes.return_value = [{'name': 'created_at_-1', 'key': {'created_at': 1}}]
+        assert ensure_sort_index('my_database', 'conflicting_collection') is False
+        assert ensure_sort_index('my_database', 'conflicting_collection') is False
+        assert mock_get_collection.return_value.create_index.call_count == 1
+
+def test_id_pool_refill_does_not_block_other_collections():
+    started, release = threading.Event(), threading.Event()
+
+    def reserve(database, collection, count):
+        if collection == 'slow':
+            started.set()
+            release.wait(5)
+        return range(1, count + 1)
+
+    pool = db_helper._IdPool()
+    with patch('src.db_helper.next_record_identifier_values', side_effect=reserve):
+        slow = threading.Thread(target=pool.next, args=('my_database', 'slow', 10))
+        slow.start()
+        try:
+            assert started.wait(5)
+            fast = threading.Thread(target=pool.next, args=('my_database', 'fast', 10))
+            fast.start()
+            fast.join(1)
+            assert not fast.is_alive()
+        finally:
+            release.set()
+            slow.join(5)
+
+def test_bulk_next_record_identifier_values_reserves_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def reserve(database, collection, count):
+        barrier.wait()
+        return range(1, count + 1)
+
+    with patch('src.db_helper.next_record_identifier_values', side_effect=reserve):
+        assert bulk_next_record_identifier_values('my_database', {'users': 2, 'posts': 1}) == {
+            'users': range(1, 3),
+            'posts': range(1, 2),
+        }
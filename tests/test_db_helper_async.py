@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.db_helper_async import aconnect_to_mongodb
+from src.pymongo_helper_async import aggregate, count, delete_many, find_one
+from src.utils import DATETIME_CODEC_OPTIONS, RAW_CODEC_OPTIONS
+
+def test_aconnect_requires_async_client(monkeypatch):
+    monkeypatch.setenv('MONGOPH_MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017')
+    with patch('src.db_helper_async.AsyncMongoClient', None):
+        with pytest.raises(ImportError):
+            asyncio.run(aconnect_to_mongodb('my_database'))
+
+def test_aconnect_no_connection_string(monkeypatch):
+    monkeypatch.delenv('MONGOPH_MONGODB_CONNECTION_STRING', raising=False)
+    with pytest.raises(ValueError):
+        asyncio.run(aconnect_to_mongodb('my_database'))
+
+def test_async_find_one_uses_datetime_codec():
+    with patch('src.pymongo_helper_async.get_async_collection') as mock_get_collection:
+        mock_get_collection.return_value.find_one = AsyncMock(return_value={'id': 1})
+        assert asyncio.run(find_one('my_database', 'my_collection')) == {'id': 1}
+        mock_get_collection.assert_called_once_with('my_database', 'my_collection', DATETIME_CODEC_OPTIONS)
+
+class _MotorCursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+def test_async_aggregate_accepts_motor_cursor():
+    with patch('src.pymongo_helper_async.get_async_collection') as mock_get_collection:
+        mock_get_collection.return_value.aggregate = MagicMock(return_value=_MotorCursor([{'id': 1}]))
+        assert asyncio.run(aggregate('my_database', 'my_collection', [])) == [{'id': 1}]
+
+def test_async_writes_invalidate_cached_reads():
+    with patch('src.pymongo_helper_async.get_async_collection') as mock_get_collection, \
+            patch('src.pymongo_helper_async._invalidate_reads') as mock_invalidate_reads:
+        mock_get_collection.return_value.delete_many = AsyncMock(return_value=MagicMock(deleted_count=2))
+        assert asyncio.run(delete_many('my_database', 'my_collection', {'id': 1})) == 2
+        mock_invalidate_reads.assert_called_once_with('my_database', 'my_collection')
+
+def test_async_find_one_raw_and_count_hint():
+    with patch('src.pymongo_helper_async.get_async_collection') as mock_get_collection:
+        mock_get_collection.return_value.find_one = AsyncMock(return_value=None)
+        mock_get_collection.return_value.count_documents = AsyncMock(return_value=3)
+        asyncio.run(find_one('my_database', 'my_collection', raw=True))
+        mock_get_collection.assert_called_once_with('my_database', 'my_collection', RAW_CODEC_OPTIONS)
+        assert asyncio.run(count('my_database', 'my_collection', {'active': True}, hint='active_1')) == 3
+        mock_get_collection.return_value.count_documents.assert_called_once_with({'active': True}, hint='active_1')
+
+def test_async_delete_many_chunks_large_in_lists():
+    with patch('src.pymongo_helper_async.get_async_collection') as mock_get_collection:
+        mock_get_collection.return_value.bulk_write = AsyncMock(return_value=MagicMock(deleted_count=5))
+        assert asyncio.run(delete_many('my_database', 'my_collection', {'id': {'$in': list(range(5))}}, chunk_size=2)) == 5
+        operations = mock_get_collection.return_value.bulk_write.call_args.args[0]
+        assert len(operations) == 3
+
+def test_async_clients_are_dropped_after_fork():
+    from src import db_helper_async
+    loop = asyncio.new_event_loop()
+    try:
+        db_helper_async._clients[loop] = {'mongodb://localhost': object()}
+        db_helper_async._reset_after_fork()
+        assert loop not in db_helper_async._clients
+    finally:
+        loop.close()
@@ -0,0 +1,274 @@
+import datetime
+import warnings
+import pytest
+from unittest.mock import patch
+from pymongo.errors import OperationFailure
+from src.db_helper import _read_cache, get_reference_key
+from src.pymongo_helper import PROJECTION, BulkWriter, PerformanceWarning, aggregate, aggregate_iter, count, delete_many, find_one, find_page, finds, finds_iter, insert_many, insert_one, update_one
+from src.utils import DATETIME_CODEC_OPTIONS, RAW_CODEC_OPTIONS
+
+def test_finds_decodes_with_datetime_codec():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        cursor = mock_get_collection.return_value.find.return_value.sort.return_value.limit.return_value
+        cursor.__iter__.return_value = iter([{'id': 1, 'created_at': '2024-05-01T08:30:00'}])
+        assert finds('my_database', 'my_collection') == [{'id': 1, 'created_at': '2024-05-01T08:30:00'}]
+        mock_get_collection.assert_called_once_with('my_database', 'my_collection', DATETIME_CODEC_OPTIONS)
+
+def test_find_one_goes_through_finds_iter():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        cursor = mock_get_collection.return_value.find.return_value
+        cursor.limit.return_value.__next__.return_value = {'id': 1}
+        assert find_one('my_database', 'my_collection', {'id': 1}) == {'id': 1}
+        cursor.sort.assert_not_called()
+        cursor.limit.assert_called_once_with(-1)
+        mock_get_collection.assert_called_once_with('my_database', 'my_collection', DATETIME_CODEC_OPTIONS)
+
+def test_finds_requires_projection():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        with pytest.raises(ValueError, match='projection'):
+            finds('my_database', 'my_collection', projection={})
+        mock_get_collection.assert_not_called()
+
+def test_aggregate_appends_projection_stage():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        pipeline = [{'$match': {'active': True}}]
+        aggregate('my_database', 'my_collection', pipeline, projection={'_id': 0, 'name': 1})
+        assert mock_get_collection.return_value.aggregate.call_args[0][0] == [
+            {'$match': {'active': True}},
+            {'$project': {'_id': 0, 'name': 1}},
+        ]
+        assert pipeline == [{'$match': {'active': True}}]
+
+def test_insert_many_stamps_documents_and_inserts_unordered():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection, \
+            patch('src.pymongo_helper.next_record_identifier_values') as mock_identifiers:
+        mock_identifiers.return_value = range(4, 6)
+        datas = [{'name': 'first'}, {'name': 'second'}]
+        records_ids = insert_many('my_database', 'my_collection', datas)
+        mock_identifiers.assert_called_once_with('my_database', 'my_collection', 2)
+        mock_get_collection.return_value.insert_many.assert_called_once_with(datas, ordered=False)
+        assert [data['id'] for data in datas] == [4, 5]
+        assert datas[0]['created_at'] is datas[1]['created_at']
+        assert datas[0]['created_at'].tzinfo is datetime.timezone.utc
+        assert records_ids == [data[get_reference_key()] for data in datas]
+
+def test_insert_many_without_documents_makes_no_call():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection, \
+            patch('src.pymongo_helper.next_record_identifier_values') as mock_identifiers:
+        assert insert_many('my_database', 'my_collection', []) == []
+        mock_identifiers.assert_not_called()
+        mock_get_collection.assert_not_called()
+
+def test_insert_one_returns_the_document_without_reading_back():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection, \
+            patch('src.pymongo_helper.next_record_identifier_value', return_value=7):
+        data = insert_one('my_database', 'my_collection', {'name': 'first'})
+        assert data['id'] == 7 and data['name'] == 'first'
+        assert isinstance(data['created_at'], str)
+        assert len(data[get_reference_key()]) == 32
+        mock_get_collection.return_value.find.assert_not_called()
+
+def test_delete_many_returns_the_deleted_count():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.delete_many.return_value.deleted_count = 3
+        assert delete_many('my_database', 'my_collection', {'name': 'first'}) == 3
+        assert delete_many('my_database', 'my_collection', {'name': 'first'}, datalist=False) is True
+        mock_get_collection.return_value.find.assert_not_called()
+
+def test_count_without_criteria_uses_the_collection_metadata():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_collection = mock_get_collection.return_value
+        mock_collection.estimated_document_count.return_value = 10
+        mock_collection.count_documents.return_value = 2
+        assert count('my_database', 'my_collection') == 10
+        assert count('my_database', 'my_collection', {'name': 'first'}) == 2
+        mock_collection.count_documents.assert_called_once_with({'name': 'first'})
+
+def test_read_cache_serves_copies_until_a_write():
+    ttl, _read_cache.ttl = _read_cache.ttl, 30
+    try:
+        with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+            mock_collection = mock_get_collection.return_value
+            mock_collection.find.return_value.sort.return_value.limit.return_value = [{'id': 1}]
+            first = finds('my_database', 'my_collection')
+            first[0]['id'] = 2
+            assert finds('my_database', 'my_collection') == [{'id': 1}]
+            assert mock_collection.find.call_count == 1
+            delete_many('my_database', 'my_collection', {'id': 1})
+            finds('my_database', 'my_collection')
+            assert mock_collection.find.call_count == 2
+    finally:
+        _read_cache.ttl = ttl
+        _read_cache.clear()
+
+def test_read_cache_skips_results_of_reads_concurrent_with_a_write():
+    ttl, _read_cache.ttl = _read_cache.ttl, 30
+    try:
+        with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+            mock_collection = mock_get_collection.return_value
+            cursor = mock_collection.find.return_value.sort.return_value.limit.return_value
+
+            def write_while_reading():
+                delete_many('my_database', 'my_collection', {'id': 1})
+                return iter([{'id': 1}])
+            cursor.__iter__.side_effect = write_while_reading
+            assert finds('my_database', 'my_collection') == [{'id': 1}]
+            cursor.__iter__.side_effect = lambda: iter([])
+            assert finds('my_database', 'my_collection') == []
+            assert mock_collection.find.call_count == 2
+    finally:
+        _read_cache.ttl = ttl
+        _read_cache.clear()
+
+def test_read_cache_skips_aggregations_writing_a_collection():
+    ttl, _read_cache.ttl = _read_cache.ttl, 30
+    try:
+        with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+            mock_collection = mock_get_collection.return_value
+            mock_collection.find.return_value.sort.return_value.limit.return_value = [{'id': 1}]
+            finds('my_database', 'totals')
+            pipeline = [{'$group': {'_id': '$customer'}}, {'$merge': {'into': 'totals'}}]
+            aggregate('my_database', 'orders', pipeline)
+            aggregate('my_database', 'orders', pipeline)
+            assert mock_collection.aggregate.call_count == 2
+            finds('my_database', 'totals')
+            assert mock_collection.find.call_count == 2
+    finally:
+        _read_cache.ttl = ttl
+        _read_cache.clear()
+
+def test_finds_iter_returns_the_cursor_without_reading_it():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        cursor = mock_get_collection.return_value.find.return_value.sort.return_value.limit.return_value
+        assert finds_iter('my_database', 'my_collection', limit=5) is cursor
+        cursor.__iter__.assert_not_called()
+
+def test_bulk_writer_flushes_every_n_operations_and_on_exit():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection, \
+            patch('src.pymongo_helper.next_record_identifier_values') as mock_identifiers:
+        mock_identifiers.side_effect = lambda database, collection, count: range(1, count + 1)
+        datas = [{'name': name} for name in ('first', 'second', 'third')]
+        with BulkWriter('my_database', 'my_collection', flush_every=2) as writer:
+            for data in datas:
+                writer.insert_one(data)
+            writer.delete_one({'name': 'first'})
+        bulk_write = mock_get_collection.return_value.bulk_write
+        assert [len(call.args[0]) for call in bulk_write.call_args_list] == [2, 2]
+        assert [data['id'] for data in datas] == [1, 2, 1]
+
+def test_bulk_writer_discards_operations_on_error():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        with pytest.raises(RuntimeError):
+            with BulkWriter('my_database', 'my_collection') as writer:
+                writer.delete_one({'name': 'first'})
+                raise RuntimeError('boom')
+        mock_get_collection.return_value.bulk_write.assert_not_called()
+
+def test_finds_raw_decodes_with_raw_codec():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        finds('my_database', 'my_collection', raw=True)
+        mock_get_collection.assert_called_once_with('my_database', 'my_collection', RAW_CODEC_OPTIONS)
+
+def test_update_one_returns_the_updated_document_in_one_command():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_collection = mock_get_collection.return_value
+        mock_collection.find_one_and_update.return_value = {'id': 1, 'name': 'second'}
+        document = update_one('my_database', 'my_collection', {'id': 1}, '$set', {'name': 'second'})
+        assert document == {'id': 1, 'name': 'second'}
+        update = mock_collection.find_one_and_update.call_args.args[1]
+        assert update == {'$set': {'name': 'second'}, '$currentDate': {'updated_at': True}}
+        mock_collection.update_one.assert_not_called()
+        mock_collection.find.assert_not_called()
+
+def test_update_one_drops_updated_at_from_the_operand():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        data = {'name': 'second', 'updated_at': '2024-05-01T08:30:00'}
+        update_one('my_database', 'my_collection', {'id': 1}, '$set', data, datalist=False)
+        update = mock_get_collection.return_value.update_one.call_args.args[1]
+        assert update == {'$set': {'name': 'second'}, '$currentDate': {'updated_at': True}}
+        assert data == {'name': 'second', 'updated_at': '2024-05-01T08:30:00'}
+
+def test_mongo_errors_are_wrapped_in_value_error():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.delete_many.side_effect = OperationFailure('not authorized')
+        with pytest.raises(ValueError, match='Database operation failure not authorized') as error:
+            delete_many('my_database', 'my_collection', {'id': 1})
+        assert isinstance(error.value.__cause__, OperationFailure)
+
+def test_finds_applies_hint_and_skips_sort_when_none():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        cursor = mock_get_collection.return_value.find.return_value
+        finds('my_database', 'my_collection', sort=None, hint='created_at_-1')
+        cursor.hint.assert_called_once_with('created_at_-1')
+        cursor.hint.return_value.sort.assert_not_called()
+        cursor.hint.return_value.limit.assert_called_once_with(0)
+
+def test_finds_pages_with_skip_or_pager():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        cursor = mock_get_collection.return_value.find.return_value.sort.return_value
+        finds('my_database', 'my_collection', skip=20, limit=10)
+        finds('my_database', 'my_collection', pager={'skip': 20, 'limit': 10})
+        assert cursor.skip.call_count == 2
+        cursor.skip.return_value.limit.assert_called_with(10)
+        with pytest.raises(ValueError, match='Pager should have skip and limit'):
+            finds('my_database', 'my_collection', pager={'skip': 20})
+
+def test_delete_many_chunks_large_in_lists():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_collection = mock_get_collection.return_value
+        mock_collection.bulk_write.return_value.deleted_count = 5
+        criteria = {'id': {'$in': list(range(5))}, 'status': 'archived'}
+        assert delete_many('my_database', 'my_collection', criteria, chunk_size=2) == 5
+        operations, = mock_collection.bulk_write.call_args.args
+        assert [operation._filter for operation in operations] == [
+            {'id': {'$in': [0, 1]}, 'status': 'archived'},
+            {'id': {'$in': [2, 3]}, 'status': 'archived'},
+            {'id': {'$in': [4]}, 'status': 'archived'},
+        ]
+        mock_collection.delete_many.assert_not_called()
+
+def test_finds_leaves_batching_to_the_server_by_default():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        finds('my_database', 'my_collection')
+        mock_get_collection.return_value.find.assert_called_once_with({}, PROJECTION, batch_size=0)
+
+def test_aggregate_allows_disk_use_by_default():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        aggregate('my_database', 'my_collection', [{'$count': 'paid'}], batch_size=500)
+        mock_get_collection.return_value.aggregate.assert_called_once_with(
+            [{'$count': 'paid'}], allowDiskUse=True, batchSize=500)
+
+def test_aggregate_warns_on_full_document_fetch():
+    with patch('src.pymongo_helper.get_collection'):
+        with pytest.warns(PerformanceWarning):
+            aggregate('my_database', 'my_collection', [{'$match': {'status': 'paid'}}])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            aggregate('my_database', 'my_collection', [{'$group': {'_id': '$customer'}}])
+            aggregate('my_database', 'my_collection', [{'$match': {'status': 'paid'}}, {'$out': 'paid'}])
+
+def test_full_document_fetch_warning_points_at_the_caller():
+    with patch('src.pymongo_helper.get_collection'):
+        for function in (aggregate, aggregate_iter):
+            with pytest.warns(PerformanceWarning) as record:
+                function('my_database', 'my_collection', [{'$match': {'status': 'paid'}}])
+            assert record[0].filename == __file__
+
+def test_find_page_runs_a_single_facet_aggregation():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.aggregate.return_value = iter([{'data': [{'id': 3}], 'total': [{'total': 12}]}])
+        page = find_page('my_database', 'my_collection', criteria={'active': True}, skip=10, limit=5)
+        assert page == {'data': [{'id': 3}], 'total': 12}
+        assert mock_get_collection.return_value.aggregate.call_args.args[0] == [
+            {'$match': {'active': True}},
+            {'$sort': {'created_at': -1}},
+            {'$facet': {
+                'data': [{'$skip': 10}, {'$limit': 5}, {'$project': PROJECTION}],
+                'total': [{'$count': 'total'}],
+            }},
+        ]
+
+def test_find_page_total_is_zero_without_matches():
+    with patch('src.pymongo_helper.get_collection') as mock_get_collection:
+        mock_get_collection.return_value.aggregate.return_value = iter([{'data': [], 'total': []}])
+        assert find_page('my_database', 'my_collection', sort=None) == {'data': [], 'total': 0}
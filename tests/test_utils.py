@@ -0,0 +1,63 @@
+import datetime
+import json
+import bson
+import pytest
+from unittest.mock import patch
+from src import utils
+from src.utils import DATETIME_CODEC_OPTIONS, datetime_formater
+
+def test_datetime_formater():
+    data = {'id': 1, 'created_at': datetime.datetime(2024, 5, 1, 8, 30, 15, 250000)}
+    assert datetime_formater(data) == {'id': 1, 'created_at': '2024-05-01T08:30:15'}
+
+def test_datetime_codec_options_match_datetime_formater():
+    date = datetime.datetime(2024, 5, 1, 8, 30, 15, 250000)
+    raw = bson.encode({'created_at': date, 'history': [{'updated_at': date}]})
+    data = bson.decode(raw, codec_options=DATETIME_CODEC_OPTIONS)
+    assert data == {'created_at': '2024-05-01T08:30:15', 'history': [{'updated_at': '2024-05-01T08:30:15'}]}
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_dumps_formats_datetimes_and_bson_types(use_orjson):
+    documents = [{'id': 1, 'created_at': datetime.datetime(2024, 4, 24, 10, 30, 15, 123456), '_id': bson.ObjectId('0' * 24)}]
+    with patch.object(utils, 'orjson', utils.orjson if use_orjson else None):
+        assert json.loads(utils.json_dumps(documents)) == [{'id': 1, 'created_at': '2024-04-24T10:30:15', '_id': '0' * 24}]
+
+def test_make_formatter_only_formats_the_given_fields():
+    date = datetime.datetime(2024, 5, 1, 8, 30, 15)
+    formatter = utils.make_formatter(('created_at', 'deleted_at'))
+    assert formatter({'created_at': date, 'updated_at': date}) == {'created_at': '2024-05-01T08:30:15', 'updated_at': date}
+
+def test_format_datetime_matches_strftime():
+    for value in (datetime.datetime(2024, 5, 1, 8, 30, 15, 250000),
+                  datetime.datetime(2024, 5, 1, 8, 30, tzinfo=datetime.timezone.utc)):
+        assert utils.format_datetime(value) == value.strftime(utils.DATETIME_FORMAT)
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_dumps_serializes_raw_bson_documents(use_orjson):
+    date = datetime.datetime(2024, 4, 24, 10, 30, 15, 123456)
+    raw = bson.decode(bson.encode({'id': 1, 'history': [{'updated_at': date}]}), codec_options=utils.RAW_CODEC_OPTIONS)
+    with patch.object(utils, 'orjson', utils.orjson if use_orjson else None):
+        assert json.loads(utils.json_dumps([raw])) == [{'id': 1, 'history': [{'updated_at': '2024-04-24T10:30:15'}]}]
+
+def test_format_datetime_cache_keeps_the_wall_time_of_aware_datetimes():
+    utc = datetime.datetime(2024, 5, 1, 8, 30, tzinfo=datetime.timezone.utc)
+    paris = utc.astimezone(datetime.timezone(datetime.timedelta(hours=2)))
+    assert utils.format_datetime(utc) == '2024-05-01T08:30:00'
+    assert utils.format_datetime(paris) == '2024-05-01T10:30:00'
+
+def test_ttl_cache_reset_does_not_wait_for_the_lock():
+    cache = utils.TTLCache()
+    cache.set('key', 1)
+    cache._lock.acquire()
+    cache.reset()
+    assert cache.get('key') is None
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_dumps_output_does_not_depend_on_orjson(use_orjson):
+    documents = {
+        'updated_at': datetime.datetime(2024, 4, 24, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'payload': bson.Binary(b'\x00\x01'),
+        'digest': b'\xff',
+    }
+    with patch.object(utils, 'orjson', utils.orjson if use_orjson else None):
+        assert json.loads(utils.json_dumps(documents)) == {'updated_at': '2024-04-24T10:30:15', 'payload': 'AAE=', 'digest': '/w=='}